@@ -0,0 +1,123 @@
+from array import array
+
+"This module stores clusters as flat coordinate arrays with union-find, so merging two clusters does not copy their venues"
+
+class Cluster:
+    """
+    Lightweight view of one cluster in a ClusterSet
+    """
+    __slots__ = ("cluster_set", "root")
+
+    def __init__(self, cluster_set, root):
+        self.cluster_set = cluster_set
+        self.root = root
+
+    def __len__(self):
+        return self.cluster_set.counts[self.root]
+
+    @property
+    def center(self):
+        return self.cluster_set.center(self.root)
+
+    @property
+    def members(self):
+        """
+        The (lat, lon) of every venue in the cluster, built on demand
+        """
+        return [(self.cluster_set.lats[i], self.cluster_set.lons[i]) for i in self.cluster_set.member_indices(self.root)]
+
+    def __repr__(self):
+        return f"Cluster(size={len(self)}, center={self.center})"
+
+
+class ClusterSet:
+    """
+    Struct-of-arrays cluster storage. Every venue is an index into the coordinate arrays, and the venues of a cluster
+    form a linked list through next_member. Clusters keep running coordinate sums and a count in arrays of their own,
+    and merging two clusters links their lists under one union-find root in O(1), so a venue costs 20 bytes
+    """
+    def __init__(self, lats, lons):
+        self.lats = lats if isinstance(lats, array) else array('d', lats)
+        self.lons = lons if isinstance(lons, array) else array('d', lons)
+        self.next_member = array('i', [-1]) * len(self.lats)
+        self.parent = array('i')
+        self.counts = array('i')
+        self.sum_lats = array('d')
+        self.sum_lons = array('d')
+        self.heads = array('i')
+        self.tails = array('i')
+        self.order = []
+
+    @classmethod
+    def from_points(cls, points):
+        return cls(array('d', (point[0] for point in points)), array('d', (point[1] for point in points)))
+
+    def new_cluster(self, point):
+        """
+        Starts a cluster with a single venue and returns the id of the cluster
+        """
+        cluster = len(self.parent)
+        self.parent.append(cluster)
+        self.counts.append(1)
+        self.sum_lats.append(self.lats[point])
+        self.sum_lons.append(self.lons[point])
+        self.heads.append(point)
+        self.tails.append(point)
+        self.order.append(cluster)
+        return cluster
+
+    def add_point(self, cluster, point):
+        self.counts[cluster] += 1
+        self.sum_lats[cluster] += self.lats[point]
+        self.sum_lons[cluster] += self.lons[point]
+        self.next_member[self.tails[cluster]] = point
+        self.tails[cluster] = point
+
+    def find(self, cluster):
+        parent = self.parent
+        while parent[cluster] != cluster:
+            parent[cluster] = parent[parent[cluster]]
+            cluster = parent[cluster]
+        return cluster
+
+    def union(self, cluster_1, cluster_2):
+        """
+        Merges two clusters and returns the id of the merged cluster
+        """
+        root_1 = self.find(cluster_1)
+        root_2 = self.find(cluster_2)
+        if root_1 == root_2:
+            return root_1
+        if self.counts[root_1] < self.counts[root_2]:
+            root_1, root_2 = root_2, root_1
+
+        self.parent[root_2] = root_1
+        self.counts[root_1] += self.counts[root_2]
+        self.sum_lats[root_1] += self.sum_lats[root_2]
+        self.sum_lons[root_1] += self.sum_lons[root_2]
+        self.next_member[self.tails[root_1]] = self.heads[root_2]
+        self.tails[root_1] = self.tails[root_2]
+        return root_1
+
+    def center(self, cluster):
+        count = self.counts[cluster]
+        return self.sum_lats[cluster] / count, self.sum_lons[cluster] / count
+
+    def member_indices(self, cluster):
+        point = self.heads[cluster]
+        while point != -1:
+            yield point
+            point = self.next_member[point]
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        for root in self.order:
+            yield Cluster(self, root)
+
+    def __getitem__(self, index):
+        return Cluster(self, self.order[index])
+
+    def total_venues(self):
+        return len(self.lats)
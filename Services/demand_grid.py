@@ -0,0 +1,183 @@
+import json
+import math
+import mmap
+from array import array
+from datetime import datetime
+from Services.scheduler import BATCH
+from Services.venue_stream import VENUE_FIELDS, VenueBuffer, parse_venues
+
+"This module precomputes a demand density raster for every hour of the week so busy areas can be looked up without API calls"
+
+HOURS_PER_WEEK = 168
+KM_PER_DEGREE_LAT = 111.0
+
+class DemandGrid:
+    def __init__(self, south, west, north, east, cell_km, values=None):
+        self.south = south
+        self.west = west
+        self.north = north
+        self.east = east
+        self.cell_km = cell_km
+        self.cell_lat = cell_km / KM_PER_DEGREE_LAT
+        self.cell_lon = cell_km / (KM_PER_DEGREE_LAT * math.cos(math.radians((south + north) / 2.0)))
+        self.rows = max(1, int(math.ceil((north - south) / self.cell_lat)))
+        self.cols = max(1, int(math.ceil((east - west) / self.cell_lon)))
+        self.values = values if values is not None else array('f', bytes(4 * HOURS_PER_WEEK * self.rows * self.cols))
+        # Cells where a venue search was still full after splitting, their demand is a lower bound
+        self.saturated = set()
+        self._file = None
+        self._mmap = None
+
+    def covers(self, coords):
+        return self.south <= coords[0] <= self.north and self.west <= coords[1] <= self.east
+
+    def cell_of(self, coords):
+        row = min(self.rows - 1, max(0, int((coords[0] - self.south) / self.cell_lat)))
+        col = min(self.cols - 1, max(0, int((coords[1] - self.west) / self.cell_lon)))
+        return row, col
+
+    def cell_center(self, row, col):
+        return self.south + (row + 0.5) * self.cell_lat, self.west + (col + 0.5) * self.cell_lon
+
+    def _offset(self, hour_index, row, col):
+        return (hour_index * self.rows + row) * self.cols + col
+
+    def get(self, hour_index, row, col):
+        return self.values[self._offset(hour_index, row, col)]
+
+    def set(self, hour_index, row, col, value):
+        self.values[self._offset(hour_index, row, col)] = value
+
+    def best_nearby(self, coords, when=None, window_km=3.0):
+        """
+        Finds the busiest cell within window_km of the coordinate for the given time,
+        scored like the live clusters as demand / sqrt(distance). Returns the cell center or None
+        """
+        if not self.covers(coords):
+            return None
+
+        when = when or datetime.now()
+        hour_index = when.weekday() * 24 + when.hour
+        center_row, center_col = self.cell_of(coords)
+        reach = max(1, int(round(window_km / self.cell_km)))
+        cos_lat = math.cos(math.radians(coords[0]))
+
+        best = None
+        best_score = 0.0
+        for row in range(max(0, center_row - reach), min(self.rows, center_row + reach + 1)):
+            base = self._offset(hour_index, row, 0)
+            for col in range(max(0, center_col - reach), min(self.cols, center_col + reach + 1)):
+                value = self.values[base + col]
+                if value <= 0:
+                    continue
+                lat, lon = self.cell_center(row, col)
+                distance = math.hypot((lat - coords[0]) * KM_PER_DEGREE_LAT, (lon - coords[1]) * KM_PER_DEGREE_LAT * cos_lat)
+                score = value / math.sqrt(max(distance, self.cell_km / 2.0))
+                if score > best_score:
+                    best_score = score
+                    best = (lat, lon)
+        return best
+
+    def save(self, path):
+        """
+        Writes the raster to path + ".bin" as raw float32 and its header to path + ".json"
+        """
+        header = {"south": self.south, "west": self.west, "north": self.north, "east": self.east,
+                  "cell_km": self.cell_km, "rows": self.rows, "cols": self.cols, "hours": HOURS_PER_WEEK,
+                  "saturated": sorted(self.saturated), "created": datetime.now().isoformat(timespec="seconds")}
+        with open(path + ".bin", 'wb') as file:
+            self.values.tofile(file)
+        with open(path + ".json", 'w', encoding='utf-8') as file:
+            json.dump(header, file, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-maps a saved raster, so only the pages that are looked up are read from disk
+        """
+        with open(path + ".json", 'r', encoding='utf-8') as file:
+            header = json.load(file)
+
+        data_file = open(path + ".bin", 'rb')
+        mapped = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        grid = cls(header["south"], header["west"], header["north"], header["east"], header["cell_km"], values=memoryview(mapped).cast('f'))
+        if (grid.rows, grid.cols) != (header["rows"], header["cols"]) or len(grid.values) != HOURS_PER_WEEK * grid.rows * grid.cols:
+            raise ValueError(f"Demand grid {path} does not match its header")
+        grid.saturated = {tuple(cell) for cell in header.get("saturated", [])}
+        grid._file = data_file
+        grid._mmap = mapped
+        return grid
+
+    def close(self):
+        if self._mmap is not None:
+            self.values.release()
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+
+
+def count_venues(client, coords, radius_m, category_id, limit=50, max_depth=2):
+    """
+    Counts the venues of one category in the square cell inscribed in the circle of radius_m around a coordinate,
+    using the Foursquare client. A search that fills a whole page is an arbitrary slice of its circle, so the square
+    is then split into four quarters that are searched again, up to max_depth times. Returns the count and whether
+    a search at the deepest level was still full, in which case the count is only a lower bound
+    """
+    venues = VenueBuffer(limit)
+    saturated = False
+
+    def search(center, radius, depth):
+        nonlocal saturated
+        params = {
+            "ll": f"{center[0]},{center[1]}",
+            "radius": int(radius),
+            "limit": limit,
+            "fsq_category_ids": category_id,
+            "fields": VENUE_FIELDS
+        }
+        if parse_venues(client.getNearbyLocations(params, stream=True, priority=BATCH), venues) < limit:
+            return
+        if depth >= max_depth:
+            saturated = True
+            return
+        offset_lat = radius / math.sqrt(2.0) / 2000.0 / KM_PER_DEGREE_LAT
+        offset_lon = offset_lat / math.cos(math.radians(center[0]))
+        for sign_lat, sign_lon in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+            search((center[0] + sign_lat * offset_lat, center[1] + sign_lon * offset_lon), radius / 2.0, depth + 1)
+
+    search(coords, radius_m, 0)
+    half_lat = radius_m / math.sqrt(2.0) / 1000.0 / KM_PER_DEGREE_LAT
+    half_lon = half_lat / math.cos(math.radians(coords[0]))
+    count = sum(1 for lat, lon in venues if abs(lat - coords[0]) <= half_lat and abs(lon - coords[1]) <= half_lon)
+    return count, saturated
+
+
+def build_demand_grid(bbox, cell_km, venue_counter, weekly_schedule, category_ids, progress=None):
+    """
+    Builds the demand raster for a bounding box (south, west, north, east).
+    venue_counter(coords, radius_m, category_id) is called once per cell and category and returns the count and whether
+    it is only a lower bound, and every hour of the week then gets the sum of the counts of the categories that are
+    busy in that hour. Cells with a lower bound count are kept in grid.saturated
+    """
+    grid = DemandGrid(*bbox, cell_km)
+    radius_m = cell_km * 1000.0 / math.sqrt(2.0)
+    cells = grid.rows * grid.cols
+
+    for cell in range(cells):
+        row, col = divmod(cell, grid.cols)
+        center = grid.cell_center(row, col)
+        counts = {}
+        for category_id in category_ids:
+            counts[category_id], saturated = venue_counter(center, radius_m, category_id)
+            if saturated:
+                grid.saturated.add((row, col))
+
+        for hour_index in range(HOURS_PER_WEEK):
+            total = sum(counts.get(category_id, 0) for category_id in weekly_schedule[hour_index])
+            if total:
+                grid.set(hour_index, row, col, total)
+
+        if progress:
+            progress(cell + 1, cells)
+
+    return grid
@@ -0,0 +1,186 @@
+import heapq
+import math
+
+"This module spreads many drivers over the busy clusters, so they are not all sent to the same hotspot"
+
+KM_PER_DEGREE = 111.0
+# Nearest clusters a driver can be assigned to, drivers are only moved between these
+CANDIDATE_CLUSTERS = 10
+
+def cluster_capacities(clusters, driver_count):
+    """
+    Gives every cluster a share of the drivers proportional to its venue count, rounded up so all drivers fit
+    """
+    sizes = [len(cluster) for cluster in clusters]
+    total = sum(sizes)
+    if total == 0:
+        return [int(math.ceil(driver_count / len(clusters)))] * len(clusters)
+    return [max(1, int(math.ceil(driver_count * size / total))) for size in sizes]
+
+def candidate_costs(driver_positions, centers, candidates=CANDIDATE_CLUSTERS):
+    """
+    Returns for every driver a dictionary from its nearest clusters to their approximate distance in kilometers,
+    using an equirectangular projection. The candidates are found by searching a grid over the cluster centers
+    ring by ring outwards, so a driver only measures the clusters around it. Also returns a function that gives
+    the distances of a driver to all clusters
+    """
+    cos_lat = math.cos(math.radians(sum(center[0] for center in centers) / len(centers)))
+    points = [(center[0] * KM_PER_DEGREE, center[1] * KM_PER_DEGREE * cos_lat) for center in centers]
+    ys = [point[0] for point in points]
+    xs = [point[1] for point in points]
+    # Cells of about two clusters each
+    cell_km = max(0.05, math.sqrt(max((max(ys) - min(ys)) * (max(xs) - min(xs)), 1e-6) / len(points)) * 1.5)
+    grid = {}
+    for index, (y, x) in enumerate(points):
+        grid.setdefault((int(math.floor(y / cell_km)), int(math.floor(x / cell_km))), []).append(index)
+    min_row = min(cell[0] for cell in grid)
+    max_row = max(cell[0] for cell in grid)
+    min_col = min(cell[1] for cell in grid)
+    max_col = max(cell[1] for cell in grid)
+
+    def ring(row, col, r):
+        if r == 0:
+            yield row, col
+            return
+        for c in range(max(col - r, min_col), min(col + r, max_col) + 1):
+            if row - r >= min_row:
+                yield row - r, c
+            if row + r <= max_row:
+                yield row + r, c
+        for cell_row in range(max(row - r + 1, min_row), min(row + r - 1, max_row) + 1):
+            if col - r >= min_col:
+                yield cell_row, col - r
+            if col + r <= max_col:
+                yield cell_row, col + r
+
+    rows = []
+    for lat, lon in driver_positions:
+        y = lat * KM_PER_DEGREE
+        x = lon * KM_PER_DEGREE * cos_lat
+        row = int(math.floor(y / cell_km))
+        col = int(math.floor(x / cell_km))
+        last_ring = max(row - min_row, max_row - row, col - min_col, max_col - col)
+        r = max(0, min_row - row, row - max_row, min_col - col, col - max_col)
+        found = []
+        while True:
+            for cell in ring(row, col, r):
+                for index in grid.get(cell, ()):
+                    found.append((math.hypot(points[index][0] - y, points[index][1] - x), index))
+            # Every cluster outside the rings searched so far is at least r cells away
+            if r >= last_ring or (len(found) >= candidates and heapq.nsmallest(candidates, found)[-1][0] <= r * cell_km):
+                break
+            r += 1
+        rows.append({index: distance for distance, index in heapq.nsmallest(candidates, found)})
+
+    def all_costs(driver):
+        lat, lon = driver_positions[driver]
+        y = lat * KM_PER_DEGREE
+        x = lon * KM_PER_DEGREE * cos_lat
+        return {index: math.hypot(point[0] - y, point[1] - x) for index, point in enumerate(points)}
+
+    return rows, all_costs
+
+def min_cost_assignment(costs, capacities, all_costs=None):
+    """
+    Assigns every driver to a column without exceeding the column capacities, minimizing the total cost.
+    costs holds a dictionary from column to cost per driver, leaving out a column forbids it for the driver.
+
+    This is a min-cost flow solved with successive shortest paths. Drivers are added one at a time, and a heap-based
+    Dijkstra runs over the columns only: moving an assigned driver from column j to k costs costs[d][k] - costs[d][j],
+    and the cheapest such move per column pair is kept in a lazily cleaned heap. Only the pairs between a driver's
+    columns exist, so the work grows with the candidates per driver rather than with the square of the columns.
+    Column potentials keep the reduced costs non-negative, and the search stops at the first column with spare
+    capacity. When a driver cannot reach spare capacity through its columns, all_costs(driver) gives it every column.
+    Returns the column index for every driver
+    """
+    driver_count = len(costs)
+    column_count = len(capacities)
+    if sum(capacities) < driver_count:
+        raise ValueError("The clusters do not have enough capacity for all drivers")
+
+    potentials = [0.0] * column_count
+    loads = [0] * column_count
+    assignment = [None] * driver_count
+    move_heaps = [{} for _ in range(column_count)]
+
+    def place(driver, column):
+        assignment[driver] = column
+        row = costs[driver]
+        base = row[column]
+        heaps = move_heaps[column]
+        for other, cost in row.items():
+            if other != column:
+                heapq.heappush(heaps.setdefault(other, []), (cost - base, driver))
+
+    def shortest_path(row):
+        distances = {column: cost - potentials[column] for column, cost in row.items()}
+        previous = {}
+        settled = []
+        done = set()
+        queue = [(distance, column) for column, distance in distances.items()]
+        heapq.heapify(queue)
+        heappop = heapq.heappop
+        heappush = heapq.heappush
+        while queue:
+            distance, column = heappop(queue)
+            if column in done or distance > distances[column]:
+                continue
+            done.add(column)
+            settled.append(column)
+            if loads[column] < capacities[column]:
+                return column, distances, previous, settled
+
+            offset = distance + potentials[column]
+            heaps = move_heaps[column]
+            emptied = []
+            for other, heap in heaps.items():
+                if other in done:
+                    continue
+                while heap and assignment[heap[0][1]] != column:
+                    heappop(heap)
+                if not heap:
+                    emptied.append(other)
+                    continue
+                move, moved_driver = heap[0]
+                candidate = offset + move - potentials[other]
+                if candidate < distances.get(other, math.inf):
+                    distances[other] = candidate
+                    previous[other] = (column, moved_driver)
+                    heappush(queue, (candidate, other))
+            for other in emptied:
+                del heaps[other]
+        return None, distances, previous, settled
+
+    for driver in range(driver_count):
+        column, distances, previous, settled = shortest_path(costs[driver])
+        if column is None:
+            if all_costs is None:
+                raise ValueError("A driver cannot reach a cluster with spare capacity")
+            costs[driver] = all_costs(driver)
+            column, distances, previous, settled = shortest_path(costs[driver])
+
+        target_distance = distances[column]
+        for k in settled:
+            potentials[k] += distances[k] - target_distance
+
+        loads[column] += 1
+        while column in previous:
+            from_column, moved_driver = previous[column]
+            place(moved_driver, column)
+            column = from_column
+        place(driver, column)
+
+    return assignment
+
+def assign_drivers(driver_positions, clusters, capacities=None, candidates=CANDIDATE_CLUSTERS):
+    """
+    Assigns every driver position to one of its nearest clusters with capacity derived from the venue counts.
+    Returns the index of the assigned cluster for every driver
+    """
+    if not driver_positions or not clusters:
+        return [None] * len(driver_positions)
+
+    if capacities is None:
+        capacities = cluster_capacities(clusters, len(driver_positions))
+    costs, all_costs = candidate_costs(driver_positions, [cluster.center for cluster in clusters], candidates)
+    return min_cost_assignment(costs, capacities, all_costs)
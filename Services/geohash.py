@@ -0,0 +1,56 @@
+"This module encodes coordinates as geohash cells, used to key statistics by area"
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def encode(lat, lon, precision=5):
+    """
+    Returns the geohash of the coordinate, precision 5 is a cell of about 5 by 5 km
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    result = []
+    bits = 0
+    value = 0
+    even = True
+    while len(result) < precision:
+        coord, interval = (lon, lon_range) if even else (lat, lat_range)
+        middle = (interval[0] + interval[1]) / 2.0
+        value <<= 1
+        if coord >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            result.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(result)
+
+def bounds(geohash):
+    """
+    Returns (south, west, north, east) of a geohash cell
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2.0
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+def decode(geohash):
+    """
+    Returns the center (lat, lon) of a geohash cell
+    """
+    south, west, north, east = bounds(geohash)
+    return (south + north) / 2.0, (west + east) / 2.0
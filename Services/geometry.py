@@ -0,0 +1,198 @@
+import heapq
+import math
+import threading
+from collections import OrderedDict
+
+"This module simplifies route geometry per zoom level and stores routes as encoded polylines"
+
+KM_PER_DEGREE = 111.0
+EQUATOR_METERS_PER_PIXEL = 156543.03
+PYRAMID_ZOOMS = (10, 12, 14, 16)
+
+def _project(points):
+    """
+    Projects (lat, lon) points to kilometers on a plane around the first point
+    """
+    cos_lat = math.cos(math.radians(points[0][0]))
+    return [(lat * KM_PER_DEGREE, lon * KM_PER_DEGREE * cos_lat) for lat, lon in points]
+
+def _segment_distance(point, start, end):
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    t = max(0.0, min(1.0, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
+
+def douglas_peucker(points, tolerance_km):
+    """
+    Removes every point that lies within tolerance_km of the simplified line, keeping the first and last point
+    """
+    if len(points) <= 2 or tolerance_km <= 0:
+        return list(points)
+
+    projected = _project(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0.0
+        index = None
+        for i in range(first + 1, last):
+            distance = _segment_distance(projected[i], projected[first], projected[last])
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+        if index is not None and max_distance > tolerance_km:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+def visvalingam(points, min_area_km2):
+    """
+    Repeatedly removes the point that forms the smallest triangle with its neighbours until every triangle is at least min_area_km2
+    """
+    if len(points) <= 2 or min_area_km2 <= 0:
+        return list(points)
+
+    projected = _project(points)
+    previous = list(range(-1, len(points) - 1))
+    following = list(range(1, len(points) + 1))
+    removed = [False] * len(points)
+
+    def area(i):
+        a, b, c = projected[previous[i]], projected[i], projected[following[i]]
+        return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2.0
+
+    heap = [(area(i), i) for i in range(1, len(points) - 1)]
+    heapq.heapify(heap)
+    areas = {i: value for value, i in heap}
+    while heap:
+        value, i = heapq.heappop(heap)
+        if removed[i] or areas.get(i) != value:
+            continue
+        if value >= min_area_km2:
+            break
+        removed[i] = True
+        before, after = previous[i], following[i]
+        following[before] = after
+        previous[after] = before
+        for neighbour in (before, after):
+            if 0 < neighbour < len(points) - 1:
+                areas[neighbour] = area(neighbour)
+                heapq.heappush(heap, (areas[neighbour], neighbour))
+
+    return [point for point, gone in zip(points, removed) if not gone]
+
+def pixel_tolerance_km(zoom, lat, pixels=0.5):
+    """
+    Size of the given number of screen pixels in kilometers at a zoom level and latitude
+    """
+    return pixels * EQUATOR_METERS_PER_PIXEL * math.cos(math.radians(lat)) / (2 ** zoom) / 1000.0
+
+def encode_polyline(points, precision=5):
+    """
+    Encodes points with the Google encoded polyline algorithm
+    """
+    factor = 10 ** precision
+    result = []
+    previous_lat = previous_lon = 0
+    for lat, lon in points:
+        lat_value = int(round(lat * factor))
+        lon_value = int(round(lon * factor))
+        for delta in (lat_value - previous_lat, lon_value - previous_lon):
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                result.append(chr((0x20 | (delta & 0x1f)) + 63))
+                delta >>= 5
+            result.append(chr(delta + 63))
+        previous_lat, previous_lon = lat_value, lon_value
+    return "".join(result)
+
+def decode_polyline(encoded, precision=5):
+    """
+    Decodes a Google encoded polyline into a list of (lat, lon) points
+    """
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+    while index < len(encoded):
+        values = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += values[0]
+        lon += values[1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+
+class RoutePyramid:
+    """
+    A route stored as encoded polylines at several levels of detail, the last level being the full geometry
+    """
+    __slots__ = ("levels", "precision")
+
+    def __init__(self, points, zooms=PYRAMID_ZOOMS, precision=6):
+        self.precision = precision
+        self.levels = []
+        if points:
+            lat = points[0][0]
+            for zoom in zooms:
+                simplified = douglas_peucker(points, pixel_tolerance_km(zoom, lat))
+                self.levels.append((zoom, encode_polyline(simplified, precision)))
+        self.levels.append((None, encode_polyline(points, precision)))
+
+    def level_for(self, zoom):
+        """
+        Index of the coarsest level that is still detailed enough for the zoom level
+        """
+        for index, (level_zoom, _) in enumerate(self.levels):
+            if level_zoom is None or (zoom is not None and level_zoom >= zoom):
+                return index
+        return len(self.levels) - 1
+
+    def for_zoom(self, zoom):
+        return decode_polyline(self.levels[self.level_for(zoom)][1], self.precision)
+
+    def nbytes(self):
+        return sum(len(encoded) for _, encoded in self.levels)
+
+
+class RouteCache:
+    """
+    Small LRU cache of route pyramids keyed by start and end rounded to about 10 meters
+    """
+    def __init__(self, max_routes=64):
+        self.max_routes = max_routes
+        self._routes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, start_coords, end_coords):
+        return tuple(round(value, 4) for value in (*start_coords, *end_coords))
+
+    def get(self, start_coords, end_coords):
+        key = self._key(start_coords, end_coords)
+        with self._lock:
+            route = self._routes.get(key)
+            if route is not None:
+                self._routes.move_to_end(key)
+            return route
+
+    def put(self, start_coords, end_coords, route):
+        key = self._key(start_coords, end_coords)
+        with self._lock:
+            self._routes[key] = route
+            self._routes.move_to_end(key)
+            while len(self._routes) > self.max_routes:
+                self._routes.popitem(last=False)
@@ -0,0 +1,136 @@
+import csv
+import json
+import math
+import socket
+import time
+from datetime import datetime
+from Services.tracing import tracer
+from TypeChooser import get_venue_type
+
+"This module keeps a busy area recommendation live while consuming a stream of GPS positions"
+
+KM_PER_DEGREE = 111.0
+
+def approx_distance_km(coords1, coords2):
+    """
+    Equirectangular distance, accurate enough for the movement thresholds and much cheaper than a geodesic
+    """
+    cos_lat = math.cos(math.radians((coords1[0] + coords2[0]) / 2.0))
+    return math.hypot((coords2[0] - coords1[0]) * KM_PER_DEGREE, (coords2[1] - coords1[1]) * KM_PER_DEGREE * cos_lat)
+
+def _parse_position(line):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        if line.startswith("{"):
+            record = json.loads(line)
+            return float(record["lat"]), float(record["lon"]), record.get("timestamp")
+        fields = next(csv.reader([line]))
+        return float(fields[0]), float(fields[1]), fields[2] if len(fields) > 2 else None
+    except (ValueError, KeyError, IndexError, StopIteration):
+        return None
+
+def replay_file(path, realtime=False):
+    """
+    Yields (lat, lon) positions from a CSV file (lat,lon[,unix timestamp]) or a JSON-lines file ({"lat", "lon", "timestamp"}).
+    With realtime the replay sleeps between positions according to their timestamps
+    """
+    previous_timestamp = None
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            position = _parse_position(line)
+            if position is None:
+                continue
+            lat, lon, timestamp = position
+            if realtime and timestamp is not None:
+                timestamp = float(timestamp)
+                if previous_timestamp is not None and timestamp > previous_timestamp:
+                    time.sleep(timestamp - previous_timestamp)
+                previous_timestamp = timestamp
+            yield lat, lon
+
+def socket_positions(host, port):
+    """
+    Yields (lat, lon) positions from a TCP feed that sends one CSV or JSON position per line
+    """
+    with socket.create_connection((host, port)) as connection:
+        with connection.makefile('r', encoding='utf-8') as lines:
+            for line in lines:
+                position = _parse_position(line)
+                if position is not None:
+                    yield position[0], position[1]
+
+
+class RecommendationStream:
+    def __init__(self, controller, process_logic, move_threshold_km=0.3, coverage_km=8.0,
+                 min_refetch_interval=60.0, hysteresis=1.2):
+        self.controller = controller
+        self.process_logic = process_logic
+        self.move_threshold_km = move_threshold_km
+        self.coverage_km = coverage_km
+        self.min_refetch_interval = min_refetch_interval
+        self.hysteresis = hysteresis
+
+        self.clusters = []
+        self.fetch_origin = None
+        self.fetch_time = None
+        self.schedule = None
+        self.scored_position = None
+        self.recommendation = None
+
+    def _needs_refetch(self, position, schedule):
+        if self.fetch_origin is None:
+            return True
+        if self.fetch_time is not None and time.monotonic() - self.fetch_time < self.min_refetch_interval:
+            return False
+        return schedule != self.schedule or approx_distance_km(self.fetch_origin, position) > self.coverage_km
+
+    def _refetch(self, position, schedule):
+        with tracer.span("stream_refetch"):
+            locations = self.controller.getLocations(position)
+            self.clusters = self.process_logic.cluster_maker(locations, self.controller.cluster_difference_for(position))
+        self.fetch_origin = position
+        self.fetch_time = time.monotonic()
+        self.schedule = schedule
+
+    def _rescore(self, position):
+        self.scored_position = position
+        if not self.clusters:
+            changed = self.recommendation is not None
+            self.recommendation = None
+            return changed
+
+        scores = self.controller.score_clusters(self.clusters, position)
+        best = scores.index(max(scores))
+        current = next((i for i, cluster in enumerate(self.clusters) if cluster.center == self.recommendation), None)
+
+        # Only switch when the new best is clearly better, so the driver is not sent back and forth between two areas
+        if current is not None and scores[best] < scores[current] * self.hysteresis:
+            return False
+        changed = self.clusters[best].center != self.recommendation
+        self.recommendation = self.clusters[best].center
+        return changed
+
+    def update(self, position, now=None):
+        """
+        Processes one GPS position and returns (recommendation, changed).
+        Venues are only fetched again when the driver leaves the covered area or the busy venue types change,
+        and clusters are only scored again once the driver has moved more than move_threshold_km
+        """
+        schedule = tuple(get_venue_type(now or datetime.now()))
+        if self._needs_refetch(position, schedule):
+            self._refetch(position, schedule)
+        elif self.scored_position is not None and approx_distance_km(self.scored_position, position) < self.move_threshold_km:
+            return self.recommendation, False
+
+        changed = self._rescore(position)
+        return self.recommendation, changed
+
+    def run(self, positions):
+        """
+        Yields (position, recommendation, changed) for every position of the feed
+        """
+        for position in positions:
+            recommendation, changed = self.update(position)
+            yield position, recommendation, changed
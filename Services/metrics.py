@@ -0,0 +1,199 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"This module keeps in-process counters, gauges and latency histograms and dumps them in the Prometheus text format"
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+def _format_labels(label_key, extra=None):
+    items = list(label_key)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    """
+    HDR-style histogram: every power of two is split into a fixed number of linear sub-buckets,
+    so the relative error of a recorded value is bounded by 1 / sub_buckets whatever its magnitude
+    """
+    def __init__(self, sub_buckets=16, lowest=1e-6):
+        self.sub_buckets = sub_buckets
+        self.lowest = lowest
+        self.buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def _index(self, value):
+        scaled = max(value / self.lowest, 1.0)
+        exponent = int(math.floor(math.log2(scaled)))
+        sub = int((scaled / (2 ** exponent) - 1.0) * self.sub_buckets)
+        return exponent * self.sub_buckets + min(sub, self.sub_buckets - 1)
+
+    def _upper_bound(self, index):
+        exponent, sub = divmod(index, self.sub_buckets)
+        return self.lowest * (2 ** exponent) * (1.0 + (sub + 1) / self.sub_buckets)
+
+    def observe(self, value):
+        index = self._index(value)
+        with self._lock:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.sum += value
+
+    def percentile(self, p):
+        """
+        Returns the upper bound of the bucket that holds the p-th percentile
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            target = p / 100.0 * self.count
+            seen = 0
+            for index in sorted(self.buckets):
+                seen += self.buckets[index]
+                if seen >= target:
+                    return self._upper_bound(index)
+        return None
+
+    def cumulative_buckets(self):
+        with self._lock:
+            result = []
+            seen = 0
+            for index in sorted(self.buckets):
+                seen += self.buckets[index]
+                result.append((self._upper_bound(index), seen))
+            return result, self.count, self.sum
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._help = {}
+        self._types = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, factory, name, help_text, labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = factory()
+                self._metrics[key] = metric
+                self._types[name] = kind
+                if help_text:
+                    self._help[name] = help_text
+            return metric
+
+    def counter(self, name, help_text="", **labels):
+        return self._get("counter", Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text="", **labels):
+        return self._get("gauge", Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text="", **labels):
+        return self._get("histogram", Histogram, name, help_text, labels)
+
+    @contextmanager
+    def time(self, name, help_text="", **labels):
+        """
+        Observes the duration of the wrapped block in seconds
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name, help_text, **labels).observe(time.perf_counter() - start)
+
+    def dump_prometheus(self):
+        """
+        Returns every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items(), key=lambda item: item[0])
+            types = dict(self._types)
+            help_texts = dict(self._help)
+
+        lines = []
+        last_name = None
+        for (name, label_key), metric in metrics:
+            if name != last_name:
+                if name in help_texts:
+                    lines.append(f"# HELP {name} {help_texts[name]}")
+                lines.append(f"# TYPE {name} {types[name]}")
+                last_name = name
+
+            if isinstance(metric, Histogram):
+                buckets, count, total = metric.cumulative_buckets()
+                for upper, seen in buckets:
+                    lines.append(f"{name}_bucket{_format_labels(label_key, ('le', f'{upper:.6g}'))} {seen}")
+                lines.append(f"{name}_bucket{_format_labels(label_key, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(label_key)} {total}")
+                lines.append(f"{name}_count{_format_labels(label_key)} {count}")
+            else:
+                lines.append(f"{name}{_format_labels(label_key)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Writes the Prometheus dump to a file, replacing it atomically so scrapers never read half a file
+        """
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(self.dump_prometheus())
+        os.replace(temp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serves the Prometheus dump on /metrics from a daemon thread
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.dump_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,137 @@
+import math
+import multiprocessing
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from Services.cluster_set import ClusterSet
+
+"This module clusters venues in longitude strips on a process pool and stitches the strips back together"
+
+KM_PER_DEGREE = 111.0
+TILES_PER_WORKER = 2
+
+def _cluster_tile(shm_name, count, start, end, core_start, core_end, cluster_difference):
+    """
+    Clusters the venues start:end of the shared lon-sorted coordinates and returns the clusters restricted to the
+    core venues core_start:core_end, as a flat array of positions and an array of cluster lengths
+    """
+    from process_logic import ProcessLogic
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        coords = shm.buf.cast('d')
+        lats = array('d', coords[start:end])
+        lons = array('d', coords[count + start:count + end])
+        coords.release()
+    finally:
+        shm.close()
+
+    cluster_set = ProcessLogic()._make_clusters(ClusterSet(lats, lons), cluster_difference)
+    members = array('i')
+    lengths = array('i')
+    for cluster in cluster_set.order:
+        before = len(members)
+        members.extend(start + i for i in cluster_set.member_indices(cluster) if core_start <= start + i < core_end)
+        if len(members) > before:
+            lengths.append(len(members) - before)
+    return members, lengths
+
+def _strips(lons, tiles, margin_deg):
+    """
+    Splits the sorted longitudes into strips of about equal venue count and returns (start, end, core_start, core_end)
+    for every strip, where start:end also holds the venues within margin_deg of the core
+    """
+    count = len(lons)
+    bounds = sorted(set(round(count * i / tiles) for i in range(tiles + 1)))
+    strips = []
+    for core_start, core_end in zip(bounds, bounds[1:]):
+        start = bisect_left(lons, lons[core_start] - margin_deg)
+        end = bisect_right(lons, lons[core_end - 1] + margin_deg)
+        strips.append((start, end, core_start, core_end))
+    return strips
+
+def _merge_fragments(cluster_set, cluster_difference, distance_finder):
+    """
+    Merges clusters whose centers are within 2 * cluster_difference, the same rule as the serial merge step,
+    until no pair is left. Candidates come from a grid of cells of that size, and clusters are visited in their
+    order, so the result does not depend on the pool scheduling
+    """
+    reach = 2 * cluster_difference
+    cos_lat = math.cos(math.radians(max(abs(lat) for lat in cluster_set.lats)))
+
+    def cell(center):
+        return int(math.floor(center[0] * KM_PER_DEGREE / reach)), int(math.floor(center[1] * KM_PER_DEGREE * cos_lat / reach))
+
+    changed = True
+    while changed:
+        changed = False
+        cells = {}
+        for cluster in cluster_set.order:
+            cells.setdefault(cell(cluster_set.center(cluster)), []).append(cluster)
+
+        alive = set(cluster_set.order)
+        visited = set()
+        order = []
+        for cluster in cluster_set.order:
+            if cluster not in alive or cluster in visited:
+                continue
+            row, col = cell(cluster_set.center(cluster))
+            for r in (row - 1, row, row + 1):
+                for c in (col - 1, col, col + 1):
+                    for other in cells.get((r, c), ()):
+                        if other == cluster or other not in alive:
+                            continue
+                        if distance_finder(cluster_set.center(cluster), cluster_set.center(other)) <= reach:
+                            alive.discard(other)
+                            alive.discard(cluster)
+                            cluster = cluster_set.union(cluster, other)
+                            alive.add(cluster)
+                            changed = True
+            visited.add(cluster)
+            order.append(cluster)
+        cluster_set.order = [cluster for cluster in order if cluster in alive]
+    return cluster_set
+
+def parallel_cluster(cluster_set, cluster_difference, distance_finder, workers=None):
+    """
+    Clusters the venues of an empty ClusterSet on a process pool. The venues are sorted by longitude into strips,
+    every strip is clustered in a worker together with the venues within 2 * cluster_difference of it, and only the
+    clusters of its own venues are kept. The strips are then stitched with the serial merge rule
+    """
+    workers = workers or os.cpu_count() or 1
+    count = cluster_set.total_venues()
+    by_lon = sorted(range(count), key=lambda i: (cluster_set.lons[i], cluster_set.lats[i]))
+    lons = array('d', (cluster_set.lons[i] for i in by_lon))
+    cos_lat = math.cos(math.radians(min(89.0, max(abs(lat) for lat in cluster_set.lats))))
+    margin_deg = 2 * cluster_difference / (KM_PER_DEGREE * cos_lat)
+    strips = _strips(lons, workers * TILES_PER_WORKER, margin_deg)
+
+    shm = shared_memory.SharedMemory(create=True, size=16 * count)
+    try:
+        coords = shm.buf.cast('d')
+        coords[:count] = array('d', (cluster_set.lats[i] for i in by_lon))
+        coords[count:] = lons
+        coords.release()
+
+        # Forking a process that runs threads can deadlock the children, so workers start from a clean server process.
+        # They import the main script again, which the caller has to guard with __main__
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(_cluster_tile, shm.name, count, *strip, cluster_difference) for strip in strips]
+            results = [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    for members, lengths in results:
+        position = 0
+        for length in lengths:
+            cluster = cluster_set.new_cluster(by_lon[members[position]])
+            for k in range(position + 1, position + length):
+                cluster_set.add_point(cluster, by_lon[members[k]])
+            position += length
+
+    return _merge_fragments(cluster_set, cluster_difference, distance_finder)
@@ -0,0 +1,319 @@
+import csv
+import gzip
+import json
+import math
+import mmap
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from Services import geohash
+
+"This module turns historical pickup logs into decayed demand counters per geohash cell and hour of the week"
+
+HOURS_PER_WEEK = 168
+LAT_FIELDS = ("lat", "latitude", "pickup_latitude", "pickup_lat")
+LON_FIELDS = ("lon", "lng", "longitude", "pickup_longitude", "pickup_lon", "pickup_lng")
+TIME_FIELDS = ("timestamp", "time", "pickup_datetime", "tpep_pickup_datetime", "pickup_time")
+# Weights are kept relative to an anchor time and rebased before they grow out of float range
+MAX_WEIGHT = 2.0 ** 64
+
+def parse_timestamp(value, timezone=None):
+    """
+    Parses a unix timestamp or an ISO 8601 date into a naive datetime in the local time of the pickup, or returns None.
+    ISO dates with an offset keep their own wall-clock time unless a timezone is given to convert them to.
+    Unix timestamps have no local time, so they raise ValueError without the timezone of the logs
+    """
+    if value is None or value == "":
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        seconds = None
+    if seconds is not None:
+        if timezone is None:
+            raise ValueError("Unix timestamps need the timezone of the pickups")
+        try:
+            return datetime.fromtimestamp(seconds, timezone).replace(tzinfo=None)
+        except (ValueError, OverflowError, OSError):
+            return None
+
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None and timezone is not None:
+        parsed = parsed.astimezone(timezone)
+    return parsed.replace(tzinfo=None)
+
+def _find_field(names, candidates, explicit=None):
+    if explicit:
+        return explicit if explicit in names else None
+    lowered = {name.lower(): name for name in names}
+    return next((lowered[candidate] for candidate in candidates if candidate in lowered), None)
+
+def read_pickups(path, lat_field=None, lon_field=None, time_field=None, timezone=None):
+    """
+    Yields (lat, lon, datetime) for every pickup of a CSV file with a header row or a JSON-lines file,
+    optionally gzip compressed. The file is read line by line, so its size does not matter. Bad rows are skipped.
+    The times are in the local time of the pickups, see parse_timestamp for the timezone
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as file:
+        first = file.readline()
+        if not first:
+            return
+
+        if first.lstrip().startswith("{"):
+            fields = None
+            for line in _chain(first, file):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if fields is None:
+                    names = list(record)
+                    fields = (_find_field(names, LAT_FIELDS, lat_field), _find_field(names, LON_FIELDS, lon_field),
+                              _find_field(names, TIME_FIELDS, time_field))
+                pickup = _to_pickup(record.get(fields[0]), record.get(fields[1]), record.get(fields[2]), timezone)
+                if pickup is not None:
+                    yield pickup
+            return
+
+        header = next(csv.reader([first]))
+        lat_name = _find_field(header, LAT_FIELDS, lat_field)
+        lon_name = _find_field(header, LON_FIELDS, lon_field)
+        time_name = _find_field(header, TIME_FIELDS, time_field)
+        if lat_name is None or lon_name is None or time_name is None:
+            print(f"Error: could not find latitude, longitude and time columns in {path}: {header}")
+            return
+
+        lat_index, lon_index, time_index = header.index(lat_name), header.index(lon_name), header.index(time_name)
+        needed = max(lat_index, lon_index, time_index)
+        for row in csv.reader(file):
+            if len(row) <= needed:
+                continue
+            pickup = _to_pickup(row[lat_index], row[lon_index], row[time_index], timezone)
+            if pickup is not None:
+                yield pickup
+
+def _chain(first, file):
+    yield first
+    yield from file
+
+def _to_pickup(lat, lon, timestamp, timezone=None):
+    try:
+        lat = float(lat)
+        lon = float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0) or (lat == 0.0 and lon == 0.0):
+        return None
+    when = parse_timestamp(timestamp, timezone)
+    if when is None:
+        return None
+    return lat, lon, when
+
+
+class PickupAggregator:
+    """
+    Counts pickups per geohash cell and hour of the week with exponential decay, so a pickup half_life_days
+    older than another one counts half as much. Memory grows with the number of cells, not with the number of pickups
+    """
+    def __init__(self, precision=6, half_life_days=28.0):
+        self.precision = precision
+        self.half_life_days = half_life_days
+        self.counts = {}
+        self.anchor = None
+        self.latest = None
+        self.events = 0
+
+    def _weight(self, timestamp):
+        return 2.0 ** ((timestamp - self.anchor) / (self.half_life_days * 86400.0))
+
+    def _rebase(self, anchor):
+        """
+        Moves the anchor time, scaling every counter so the weights stay in float range
+        """
+        factor = 2.0 ** ((self.anchor - anchor) / (self.half_life_days * 86400.0))
+        for values in self.counts.values():
+            for i in range(HOURS_PER_WEEK):
+                values[i] *= factor
+        self.anchor = anchor
+
+    def add(self, lat, lon, when, weight=1.0):
+        timestamp = when.timestamp()
+        if self.anchor is None:
+            self.anchor = timestamp
+        if self.latest is None or timestamp > self.latest:
+            self.latest = timestamp
+
+        decayed = weight * self._weight(timestamp)
+        if decayed > MAX_WEIGHT:
+            self._rebase(timestamp)
+            decayed = weight
+
+        cell = geohash.encode(lat, lon, self.precision)
+        values = self.counts.get(cell)
+        if values is None:
+            values = self.counts[cell] = array('d', bytes(8 * HOURS_PER_WEEK))
+        values[when.weekday() * 24 + when.hour] += decayed
+        self.events += 1
+
+    def add_all(self, pickups, progress=None, every=1000000):
+        for pickup in pickups:
+            self.add(*pickup)
+            if progress and self.events % every == 0:
+                progress(self.events)
+
+    def merge_prior(self, prior):
+        """
+        Adds the counters of a saved prior, so new logs can be ingested on top of earlier ones
+        """
+        if prior.precision != self.precision:
+            raise ValueError(f"Cannot merge a prior with geohash precision {prior.precision} into precision {self.precision}")
+        if self.anchor is None:
+            self.anchor = prior.reference_time
+        if self.latest is None or prior.reference_time > self.latest:
+            self.latest = prior.reference_time
+
+        weight = self._weight(prior.reference_time)
+        for index, cell in enumerate(prior.cells):
+            values = self.counts.get(cell)
+            if values is None:
+                values = self.counts[cell] = array('d', bytes(8 * HOURS_PER_WEEK))
+            for k in range(prior.offsets[index], prior.offsets[index + 1]):
+                values[prior.hours[k]] += prior.values[k] * weight
+        self.events += prior.events
+
+    def save(self, path):
+        """
+        Writes the counters decayed to the latest pickup to path + ".bin" and the cells to path + ".json".
+        Only the hours with pickups are stored: a uint32 offset per cell, then the float32 counts and their uint8 hours
+        """
+        if self.anchor is not None and self.latest != self.anchor:
+            self._rebase(self.latest)
+
+        cells = sorted(self.counts)
+        offsets = array('I', [0])
+        values = array('f')
+        hours = array('B')
+        for cell in cells:
+            for hour_index, value in enumerate(self.counts[cell]):
+                if value > 0:
+                    values.append(value)
+                    hours.append(hour_index)
+            offsets.append(len(values))
+
+        header = {"precision": self.precision, "half_life_days": self.half_life_days,
+                  "reference_time": self.latest or 0.0, "events": self.events, "entries": len(values),
+                  "created": datetime.now().isoformat(timespec="seconds"), "cells": cells}
+        with open(path + ".bin", 'wb') as file:
+            offsets.tofile(file)
+            values.tofile(file)
+            hours.tofile(file)
+        with open(path + ".json", 'w', encoding='utf-8') as file:
+            json.dump(header, file)
+
+
+class PickupPrior:
+    """
+    Read-only view of saved pickup counters, answering the demand of a cell and hour with a dictionary lookup
+    and a binary search over the at most 168 hours of the cell
+    """
+    def __init__(self, precision, half_life_days, reference_time, cells, offsets, values, hours, events=0):
+        self.precision = precision
+        self.half_life_days = half_life_days
+        self.reference_time = reference_time
+        self.cells = cells
+        self.offsets = offsets
+        self.values = values
+        self.hours = hours
+        self.events = events
+        self.index = {cell: i for i, cell in enumerate(cells)}
+        self.hour_means = self._hour_means()
+        self._file = None
+        self._mmap = None
+
+    def _hour_means(self):
+        means = array('d', bytes(8 * HOURS_PER_WEEK))
+        if not self.cells:
+            return means
+        for k in range(len(self.values)):
+            means[self.hours[k]] += self.values[k]
+        for hour_index in range(HOURS_PER_WEEK):
+            means[hour_index] /= len(self.cells)
+        return means
+
+    def demand(self, coords, when=None):
+        """
+        Decayed pickup count of the cell containing the coordinate in the hour of the week of when
+        """
+        i = self.index.get(geohash.encode(coords[0], coords[1], self.precision))
+        if i is None:
+            return 0.0
+        when = when or datetime.now()
+        hour_index = when.weekday() * 24 + when.hour
+        end = self.offsets[i + 1]
+        k = bisect_left(self.hours, hour_index, self.offsets[i], end)
+        if k < end and self.hours[k] == hour_index:
+            return self.values[k]
+        return 0.0
+
+    def relative_demand(self, coords, when=None):
+        """
+        Demand of the cell compared to the average cell in the same hour, 1.0 is average and 0.0 is no pickups seen
+        """
+        when = when or datetime.now()
+        mean = self.hour_means[when.weekday() * 24 + when.hour]
+        if mean <= 0:
+            return 0.0
+        return self.demand(coords, when) / mean
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-maps saved counters, so only the pages of the cells that are looked up are read from disk
+        """
+        with open(path + ".json", 'r', encoding='utf-8') as file:
+            header = json.load(file)
+
+        cells = header["cells"]
+        entries = header["entries"]
+        data_file = open(path + ".bin", 'rb')
+        mapped = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        values_start = 4 * (len(cells) + 1)
+        hours_start = values_start + 4 * entries
+        if len(mapped) != hours_start + entries:
+            mapped.close()
+            data_file.close()
+            raise ValueError(f"Pickup prior {path} does not match its header")
+
+        view = memoryview(mapped)
+        prior = cls(header["precision"], header["half_life_days"], header["reference_time"], cells,
+                    view[:values_start].cast('I'), view[values_start:hours_start].cast('f'), view[hours_start:],
+                    header.get("events", 0))
+        view.release()
+        prior._file = data_file
+        prior._mmap = mapped
+        return prior
+
+    def close(self):
+        if self._mmap is not None:
+            for view in (self.offsets, self.values, self.hours):
+                view.release()
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+
+
+def demand_multiplier(prior, coords, when=None, weight=0.5):
+    """
+    Factor applied to a cluster score, 1.0 where no pickups were seen and growing with the logarithm of the
+    demand compared to the average cell, so a few very busy cells do not outweigh the venues and the distance
+    """
+    if prior is None:
+        return 1.0
+    return 1.0 + weight * math.log1p(prior.relative_demand(coords, when))
@@ -0,0 +1,147 @@
+import json
+import math
+import threading
+import time
+import zlib
+from Services import geohash
+from Services.metrics import metrics
+from Services.tracing import tracer
+
+"This module plans venue searches, picking the search radius from the venue density seen earlier in the same area"
+
+KM_PER_DEGREE = 111.0
+PAGE_FILL = 0.8
+HEX_DIRECTIONS = [math.radians(angle) for angle in range(0, 360, 60)]
+
+class QueryPlanner:
+    """
+    Keeps a venue density per geohash cell and venue type selection, and uses it to search with a radius
+    that returns close to one full page. Sparse areas expand the radius, dense areas contract it and
+    cover the surroundings with extra tiles, until target_count venues are found or the time runs out
+    """
+    def __init__(self, target_count=100, page_limit=50, default_radius=10000, min_radius=500, max_radius=50000,
+                 max_queries=7, deadline=4.0, precision=5, smoothing=0.5):
+        self.target_count = target_count
+        self.page_limit = page_limit
+        self.default_radius = default_radius
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+        self.max_queries = max_queries
+        self.deadline = deadline
+        self.precision = precision
+        self.smoothing = smoothing
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _key(self, coords, types):
+        return f"{geohash.encode(coords[0], coords[1], self.precision)}:{zlib.crc32(types.encode()):08x}"
+
+    def density(self, coords, types):
+        """
+        Venues per square kilometer seen around the coordinate, or None when the area was not searched before
+        """
+        with self._lock:
+            stat = self.stats.get(self._key(coords, types))
+        return stat[0] if stat else None
+
+    def record(self, coords, types, radius, count, saturated):
+        """
+        Updates the density of the area with the result count of a search. A full page only tells that the
+        density is at least the observed one, so it can raise the estimate but never lower it
+        """
+        observed = count / (math.pi * (radius / 1000.0) ** 2)
+        key = self._key(coords, types)
+        with self._lock:
+            stat = self.stats.get(key)
+            if stat is None:
+                self.stats[key] = [observed, 1]
+            elif saturated:
+                stat[0] = max(stat[0], observed)
+                stat[1] += 1
+            else:
+                stat[0] = stat[0] * (1 - self.smoothing) + observed * self.smoothing
+                stat[1] += 1
+
+    def radius_for(self, density, count):
+        """
+        Radius in meters expected to contain count venues at the given density
+        """
+        if not density or density <= 0:
+            return self.max_radius
+        radius = math.sqrt(count / (math.pi * density)) * 1000.0
+        return int(min(self.max_radius, max(self.min_radius, radius)))
+
+    def initial_radius(self, coords, types):
+        density = self.density(coords, types)
+        if density is None:
+            return self.default_radius
+        return self.radius_for(density, self.page_limit * PAGE_FILL)
+
+    def search(self, coords, types, fetch, venues):
+        """
+        Searches around coords until venues holds target_count venues. fetch(center, radius) adds the venues
+        of one search to venues, which skips duplicates, and returns the number of results of the search.
+        Every page is kept, a full page is followed by at most one smaller search and the tiles around it
+        """
+        stop_at = time.monotonic() + self.deadline
+        queries = 0
+
+        def run(center, radius, action):
+            nonlocal queries
+            queries += 1
+            metrics.counter("location_queries_total", "Venue searches issued by the query planner", action=action).inc()
+            with tracer.span("location_query", action=action, radius=radius):
+                count = fetch(center, radius)
+            saturated = count >= self.page_limit
+            self.record(center, types, radius, count, saturated)
+            return saturated
+
+        def has_budget():
+            return queries < self.max_queries and time.monotonic() < stop_at and len(venues) < self.target_count
+
+        radius = self.initial_radius(coords, types)
+        action = "initial"
+        saturated = run(coords, radius, action)
+        if not saturated:
+            while has_budget() and radius < self.max_radius:
+                # Too few venues in the circle, grow it to where the target count is expected
+                radius = int(min(self.max_radius, max(radius * 1.5, min(radius * 4, self.radius_for(self.density(coords, types), self.target_count)))))
+                action = "expand"
+                if run(coords, radius, action):
+                    break
+        elif radius > self.min_radius and has_budget():
+            # A full page is an arbitrary slice of the circle and only gives a lower bound of the density.
+            # Keep it and jump straight to a circle expected to fit on one page, at most half the radius
+            radius = min(radius // 2, self.radius_for(self.density(coords, types), self.page_limit * PAGE_FILL))
+            radius = max(self.min_radius, radius)
+            action = "contract"
+            saturated = run(coords, radius, action)
+
+        if action == "contract" or (action == "initial" and saturated):
+            # Dense area, cover the ring around the center circle with tiles of the same radius
+            offset_km = radius / 1000.0 * math.sqrt(3)
+            cos_lat = math.cos(math.radians(coords[0]))
+            for angle in HEX_DIRECTIONS:
+                if not has_budget():
+                    break
+                center = (coords[0] + offset_km * math.sin(angle) / KM_PER_DEGREE,
+                          coords[1] + offset_km * math.cos(angle) / (KM_PER_DEGREE * cos_lat))
+                run(center, radius, "tile")
+
+        return venues
+
+    def save(self, path):
+        with self._lock:
+            stats = dict(self.stats)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(stats, file)
+
+    def load(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                stats = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Error loading query stats: {e}")
+            return
+        with self._lock:
+            self.stats.update(stats)
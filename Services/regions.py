@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from Services import geohash
+from Services.query_planner import QueryPlanner
+
+"This module keeps warm state per city region, loading regions on first use and evicting the least recently used ones"
+
+VENUE_CACHE_SIZE = 64
+VENUE_CACHE_TTL = 600.0
+
+class Region:
+    """
+    A city region from the config, every path is optional and relative to the project directory
+    """
+    def __init__(self, name, bbox, busy_address=None, idle_address=None, cluster_difference=1.5,
+                 demand_grid=None, pickup_prior=None, tile_cache=None, query_stats=None):
+        self.name = name
+        self.south, self.west, self.north, self.east = bbox
+        self.busy_address = tuple(busy_address) if busy_address else None
+        self.idle_address = tuple(idle_address) if idle_address else None
+        self.cluster_difference = cluster_difference
+        self.demand_grid = demand_grid
+        self.pickup_prior = pickup_prior
+        self.tile_cache = tile_cache
+        self.query_stats = query_stats
+
+    @classmethod
+    def from_config(cls, entry, base_dir):
+        def path(key):
+            return os.path.join(base_dir, entry[key]) if entry.get(key) else None
+
+        return cls(entry["name"], entry["bbox"], entry.get("busyAddress"), entry.get("idleAddress"),
+                   entry.get("clusterDifference", 1.5), path("demandGrid"), path("pickupPrior"),
+                   path("tileCache"), path("queryStats"))
+
+    def contains(self, coords):
+        return self.south <= coords[0] <= self.north and self.west <= coords[1] <= self.east
+
+
+class VenueCache:
+    """
+    Recent venue searches keyed by geohash cell and venue type selection, so a driver moving within a cell does not search again
+    """
+    def __init__(self, max_entries=VENUE_CACHE_SIZE, ttl=VENUE_CACHE_TTL, precision=6):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.precision = precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, coords, types):
+        return geohash.encode(coords[0], coords[1], self.precision), types
+
+    def get(self, coords, types):
+        key = self._key(coords, types)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, coords, types, venues):
+        key = self._key(coords, types)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), venues)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RegionState:
+    """
+    Everything a region keeps warm between queries: the schedule index, recent venue searches, the search density
+    stats, the demand grid, the pickup prior and the tile cache
+    """
+    def __init__(self, region):
+        from TypeChooser import build_weekly_schedule
+
+        self.region = region
+        self.schedule = build_weekly_schedule()
+        self.venue_cache = VenueCache()
+        self.query_planner = QueryPlanner()
+        if region.query_stats and os.path.exists(region.query_stats):
+            self.query_planner.load(region.query_stats)
+
+        self.demand_grid = None
+        if region.demand_grid and os.path.exists(region.demand_grid + ".json"):
+            from Services.demand_grid import DemandGrid
+
+            self.demand_grid = DemandGrid.load(region.demand_grid)
+
+        self.pickup_prior = None
+        if region.pickup_prior and os.path.exists(region.pickup_prior + ".json"):
+            from Services.pickup_prior import PickupPrior
+
+            self.pickup_prior = PickupPrior.load(region.pickup_prior)
+
+        self._tile_cache = None
+        self._tile_lock = threading.Lock()
+        # Maintained by the registry: the callers holding the state and whether it was evicted while held
+        self.users = 0
+        self.evicted = False
+
+    def tile_cache(self, url_template, max_bytes):
+        """
+        The tile cache of the region, opened on first use, or None when the region has no tile cache path
+        """
+        if self.region.tile_cache is None:
+            return None
+        with self._tile_lock:
+            if self._tile_cache is None:
+                from Services.tile_cache import TileCache
+
+                self._tile_cache = TileCache(self.region.tile_cache, url_template, max_bytes=max_bytes)
+            return self._tile_cache
+
+    def close(self):
+        """
+        Saves the density stats and releases the memory-mapped files and the tile cache
+        """
+        if self.region.query_stats:
+            try:
+                self.query_planner.save(self.region.query_stats)
+            except OSError as e:
+                print(f"Error saving query stats of region {self.region.name}: {e}")
+        if self.demand_grid is not None:
+            self.demand_grid.close()
+        if self.pickup_prior is not None:
+            self.pickup_prior.close()
+        if self._tile_cache is not None:
+            self._tile_cache.close()
+
+
+class RegionRegistry:
+    """
+    Finds the region of a coordinate and loads its state on first use. At most max_loaded regions are kept,
+    the least recently used one is evicted when another one has to be loaded. Callers hold a state between
+    acquire and release, an evicted state is closed once its last holder releases it
+    """
+    def __init__(self, regions, max_loaded=2):
+        self.regions = list(regions)
+        self.max_loaded = max(1, max_loaded)
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, entries, max_loaded=2, base_dir=None):
+        base_dir = base_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return cls([Region.from_config(entry, base_dir) for entry in entries], max_loaded)
+
+    def region_for(self, coords):
+        if coords is None:
+            return None
+        return next((region for region in self.regions if region.contains(coords)), None)
+
+    def acquire(self, region):
+        """
+        Returns the state of the region, loading it on first use, and keeps it open until it is released
+        """
+        evicted = []
+        with self._lock:
+            state = self._states.get(region.name)
+            if state is not None:
+                self._states.move_to_end(region.name)
+                state.users += 1
+                return state
+            state = RegionState(region)
+            state.users = 1
+            self._states[region.name] = state
+            while len(self._states) > self.max_loaded:
+                old = self._states.popitem(last=False)[1]
+                old.evicted = True
+                if old.users == 0:
+                    evicted.append(old)
+        for old in evicted:
+            old.close()
+        return state
+
+    def release(self, state):
+        """
+        Gives back a state returned by acquire, closing it when it was evicted and this was its last holder
+        """
+        if state is None:
+            return
+        with self._lock:
+            state.users -= 1
+            close = state.evicted and state.users == 0
+        if close:
+            state.close()
+
+    @contextmanager
+    def _held(self, region):
+        state = self.acquire(region)
+        try:
+            yield state
+        finally:
+            self.release(state)
+
+    def using(self, coords):
+        """
+        Context manager holding the state of the region containing the coordinate, or giving None outside every region
+        """
+        region = self.region_for(coords)
+        return self._held(region) if region is not None else nullcontext()
+
+    def loaded(self):
+        with self._lock:
+            return list(self._states)
+
+    def close(self):
+        with self._lock:
+            states = list(self._states.values())
+            self._states.clear()
+        for state in states:
+            state.close()
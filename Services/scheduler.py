@@ -0,0 +1,246 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from Services.metrics import metrics
+
+"This module runs all outbound API calls through one scheduler with priority classes, per-provider quotas and deadlines"
+
+INTERACTIVE = 0
+PREFETCH = 1
+BATCH = 2
+PRIORITY_NAMES = ("interactive", "prefetch", "batch")
+
+# Seconds a request may wait in the queue before it is dropped as stale, None waits forever
+DEFAULT_DEADLINES = (10.0, 30.0, None)
+
+# Requests per second and burst size per provider, Nominatim and the public OSRM server ask for at most one request per second
+DEFAULT_QUOTAS = {
+    "foursquare": (10.0, 20),
+    "osrm": (1.0, 2),
+    "nominatim": (1.0, 1),
+    "tiles": (20.0, 40),
+}
+
+class DroppedRequest(Exception):
+    """
+    Raised by a request that was still queued when its deadline passed
+    """
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def wait(self, now, reserve=0.0):
+        """
+        Returns 0 when more than reserve tokens are left, otherwise the seconds until that is the case
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0 + reserve:
+            return 0.0
+        return (1.0 + reserve - self.tokens) / self.rate
+
+    def take(self, now, reserve=0.0):
+        """
+        Takes a token when more than reserve tokens are left and returns 0, otherwise returns the seconds until that is the case
+        """
+        delay = self.wait(now, reserve)
+        if delay == 0.0:
+            self.tokens -= 1.0
+        return delay
+
+
+class _Job:
+    __slots__ = ("provider", "priority", "deadline", "submitted", "func", "args", "kwargs", "future")
+
+    def __init__(self, provider, priority, deadline, func, args, kwargs):
+        self.provider = provider
+        self.priority = priority
+        self.submitted = time.monotonic()
+        self.deadline = self.submitted + deadline if deadline is not None else None
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class RequestScheduler:
+    """
+    Runs requests on a fixed set of worker threads, always picking the oldest request of the most urgent
+    priority class whose provider still has quota. Prefetch and batch requests never take the last worker
+    or the last token of a provider, so an interactive request does not have to wait behind them
+    """
+    def __init__(self, max_workers=6, quotas=None):
+        self.max_workers = max_workers
+        self.buckets = {provider: TokenBucket(rate, burst) for provider, (rate, burst) in (quotas or DEFAULT_QUOTAS).items()}
+        self._queues = [{} for _ in PRIORITY_NAMES]
+        self._condition = threading.Condition()
+        self._workers = []
+        self._running_background = 0
+        self._queued = [0 for _ in PRIORITY_NAMES]
+        self._local = threading.local()
+        self._closed = False
+
+    def submit(self, provider, func, *args, priority=INTERACTIVE, deadline=..., **kwargs):
+        """
+        Queues func(*args, **kwargs) as a request to provider and returns a Future with its result.
+        The deadline defaults to the one of the priority class
+        """
+        if deadline is ...:
+            deadline = DEFAULT_DEADLINES[priority]
+        job = _Job(provider, priority, deadline, func, args, kwargs)
+        if getattr(self._local, "in_job", False):
+            # Already running inside a scheduled request, which took the quota for it
+            self._run(job)
+            return job.future
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The request scheduler is shut down")
+            self._queues[priority].setdefault(provider, deque()).append(job)
+            self._count_queued(priority, 1)
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, name=f"request-scheduler-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify()
+        return job.future
+
+    def call(self, provider, func, *args, priority=INTERACTIVE, deadline=..., **kwargs):
+        """
+        Runs func through the scheduler and waits for its result
+        """
+        return self.submit(provider, func, *args, priority=priority, deadline=deadline, **kwargs).result()
+
+    def call_inline(self, provider, func, *args, deadline=DEFAULT_DEADLINES[INTERACTIVE], **kwargs):
+        """
+        Runs func on the calling thread as soon as provider has quota, for callers with threads of their own such as
+        the tile loaders of the map widget, so they do not hold the shared workers. Raises DroppedRequest when the
+        quota does not free up before the deadline
+        """
+        submitted = time.monotonic()
+        bucket = self.buckets.get(provider)
+        while bucket is not None:
+            with self._condition:
+                now = time.monotonic()
+                delay = bucket.take(now)
+            if delay == 0.0:
+                break
+            if deadline is not None and now + delay > submitted + deadline:
+                metrics.counter("scheduler_dropped_total", "Requests dropped before they ran", provider=provider,
+                                priority=PRIORITY_NAMES[INTERACTIVE], reason="expired").inc()
+                raise DroppedRequest(f"{provider} request expired after {now - submitted:.1f}s")
+            time.sleep(delay)
+
+        metrics.histogram("scheduler_wait_seconds", "Time requests spent queued in the scheduler",
+                          provider=provider, priority=PRIORITY_NAMES[INTERACTIVE]).observe(time.monotonic() - submitted)
+        return func(*args, **kwargs)
+
+    def cancel(self, priority):
+        """
+        Drops every queued request of a priority class
+        """
+        with self._condition:
+            queues = self._queues[priority]
+            self._queues[priority] = {}
+            self._count_queued(priority, -self._queued[priority])
+        for queue in queues.values():
+            for job in queue:
+                self._drop(job, "cancelled")
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for priority in range(len(PRIORITY_NAMES)):
+            self.cancel(priority)
+
+    def _count_queued(self, priority, change):
+        self._queued[priority] += change
+        metrics.gauge("scheduler_queue_length", "Requests waiting in the scheduler", priority=PRIORITY_NAMES[priority]).set(self._queued[priority])
+
+    def _drop(self, job, reason):
+        metrics.counter("scheduler_dropped_total", "Requests dropped before they ran", provider=job.provider,
+                        priority=PRIORITY_NAMES[job.priority], reason=reason).inc()
+        if job.future.set_running_or_notify_cancel():
+            job.future.set_exception(DroppedRequest(f"{job.provider} request {reason} after {time.monotonic() - job.submitted:.1f}s"))
+
+    def _next_job(self, now):
+        """
+        Returns the next job to run or None, the jobs that passed their deadline and the seconds until a quota frees up.
+        Within a priority class the oldest request whose provider has quota runs first, whatever its provider
+        """
+        expired = []
+        wait = None
+        for priority, queues in enumerate(self._queues):
+            background = priority != INTERACTIVE
+            if background and self._running_background >= self.max_workers - 1:
+                break
+            oldest = None
+            for provider, queue in queues.items():
+                while queue and queue[0].deadline is not None and queue[0].deadline < now:
+                    expired.append(queue.popleft())
+                    self._count_queued(priority, -1)
+                if not queue:
+                    continue
+                bucket = self.buckets.get(provider)
+                delay = bucket.wait(now, reserve=self._reserve(bucket, background)) if bucket else 0.0
+                if delay > 0.0:
+                    wait = delay if wait is None else min(wait, delay)
+                elif oldest is None or queue[0].submitted < oldest[0].submitted:
+                    oldest = queue
+            if oldest is not None:
+                job = oldest.popleft()
+                bucket = self.buckets.get(job.provider)
+                if bucket:
+                    bucket.take(now, reserve=self._reserve(bucket, background))
+                self._count_queued(priority, -1)
+                return job, expired, None
+        return None, expired, wait
+
+    def _reserve(self, bucket, background):
+        return min(1.0, bucket.burst - 1.0) if background else 0.0
+
+    def _work(self):
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+                job, expired, wait = self._next_job(time.monotonic())
+                if job is None and not expired:
+                    self._condition.wait(wait)
+                elif job is not None and job.priority != INTERACTIVE:
+                    self._running_background += 1
+
+            for stale in expired:
+                self._drop(stale, "expired")
+            if job is None:
+                continue
+
+            metrics.histogram("scheduler_wait_seconds", "Time requests spent queued in the scheduler",
+                              provider=job.provider, priority=PRIORITY_NAMES[job.priority]).observe(time.monotonic() - job.submitted)
+            self._local.in_job = True
+            try:
+                self._run(job)
+            finally:
+                self._local.in_job = False
+                with self._condition:
+                    if job.priority != INTERACTIVE:
+                        self._running_background -= 1
+                    self._condition.notify()
+
+    def _run(self, job):
+        if not job.future.set_running_or_notify_cancel():
+            return
+        try:
+            job.future.set_result(job.func(*job.args, **job.kwargs))
+        except BaseException as e:
+            job.future.set_exception(e)
+
+
+scheduler = RequestScheduler()
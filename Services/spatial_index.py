@@ -0,0 +1,48 @@
+import math
+
+"This module indexes points in a uniform grid for fast nearest neighbour lookups"
+
+KM_PER_DEGREE = 111.0
+
+class GridIndex:
+    def __init__(self, points, cell_km=0.5):
+        self.points = list(points)
+        self.cell_km = cell_km
+        reference_lat = sum(point[0] for point in self.points) / len(self.points) if self.points else 0.0
+        self.cos_lat = math.cos(math.radians(reference_lat))
+        self.cells = {}
+        for index, point in enumerate(self.points):
+            self.cells.setdefault(self._cell(point), []).append(index)
+
+    def _cell(self, coords):
+        return (int(math.floor(coords[0] * KM_PER_DEGREE / self.cell_km)),
+                int(math.floor(coords[1] * KM_PER_DEGREE * self.cos_lat / self.cell_km)))
+
+    def _distance_km(self, coords1, coords2):
+        return math.hypot((coords2[0] - coords1[0]) * KM_PER_DEGREE, (coords2[1] - coords1[1]) * KM_PER_DEGREE * self.cos_lat)
+
+    def nearest(self, coords, max_km):
+        """
+        Returns the closest indexed point within max_km of the coordinate, or None
+        """
+        if not self.points:
+            return None
+
+        row, col = self._cell(coords)
+        reach = int(math.ceil(max_km / self.cell_km))
+        best = None
+        best_distance = max_km
+        for r in range(row - reach, row + reach + 1):
+            for c in range(col - reach, col + reach + 1):
+                for index in self.cells.get((r, c), ()):
+                    distance = self._distance_km(coords, self.points[index])
+                    if distance <= best_distance:
+                        best_distance = distance
+                        best = self.points[index]
+        return best
+
+    def nearest_all(self, queries, max_km):
+        """
+        Returns the closest indexed point within max_km for every query coordinate
+        """
+        return [self.nearest(coords, max_km) for coords in queries]
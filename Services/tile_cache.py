@@ -0,0 +1,194 @@
+import math
+import sqlite3
+import threading
+import time
+from Services.metrics import metrics
+from Services.scheduler import INTERACTIVE, PREFETCH, DroppedRequest, scheduler
+
+"This module keeps map tiles in an MBTiles (SQLite) file with LRU eviction and prefetches tiles in the background"
+
+def deg_to_tile(lat, lon, zoom):
+    """
+    Converts a coordinate to the x and y of the slippy map tile that contains it
+    """
+    lat_rad = math.radians(lat)
+    n = 2 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+class TileCache:
+    def __init__(self, path, url_template, max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.url_template = url_template
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, "
+            "tile_data BLOB, size INTEGER, last_access REAL, PRIMARY KEY (zoom_level, tile_column, tile_row))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS tiles_last_access ON tiles (last_access)")
+        self._connection.execute("INSERT OR REPLACE INTO metadata VALUES ('name', 'tile_cache'), ('format', 'png'), ('source', ?)", (url_template,))
+        self._connection.commit()
+        self.total_bytes = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+        metrics.gauge("tile_cache_bytes", "Bytes stored in the tile cache").set(self.total_bytes)
+
+    def _key(self, zoom, x, y):
+        # MBTiles stores rows in TMS order, which counts from the bottom of the map
+        return zoom, x, (2 ** zoom - 1) - y
+
+    def get(self, zoom, x, y):
+        """
+        Returns the cached tile bytes or None, and marks the tile as recently used
+        """
+        key = self._key(zoom, x, y)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", key).fetchone()
+            if row is None:
+                metrics.counter("tile_cache_requests_total", "Tile cache lookups by result", result="miss").inc()
+                return None
+            self._connection.execute(
+                "UPDATE tiles SET last_access=? WHERE zoom_level=? AND tile_column=? AND tile_row=?", (time.time(),) + key)
+            self._connection.commit()
+        metrics.counter("tile_cache_requests_total", "Tile cache lookups by result", result="hit").inc()
+        return row[0]
+
+    def contains(self, zoom, x, y):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", self._key(zoom, x, y)).fetchone() is not None
+
+    def put(self, zoom, x, y, data):
+        """
+        Stores a tile and evicts the least recently used tiles once the cache is over its size limit
+        """
+        key = self._key(zoom, x, y)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", key).fetchone()
+            if row is not None:
+                self.total_bytes -= row[0]
+            self._connection.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?, ?)", key + (data, len(data), time.time()))
+            self.total_bytes += len(data)
+            if self.total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+            self._connection.commit()
+        metrics.gauge("tile_cache_bytes", "Bytes stored in the tile cache").set(self.total_bytes)
+
+    def _evict(self, target_bytes):
+        while self.total_bytes > target_bytes:
+            rows = self._connection.execute(
+                "SELECT zoom_level, tile_column, tile_row, size FROM tiles ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            self._connection.executemany(
+                "DELETE FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", [row[:3] for row in rows])
+            self.total_bytes -= sum(row[3] for row in rows)
+            metrics.counter("tile_cache_evictions_total", "Tiles evicted from the tile cache").inc(len(rows))
+
+    def download(self, zoom, x, y, priority=INTERACTIVE, inline=False):
+        """
+        Downloads a tile through the request scheduler, with inline on the calling thread instead of a shared worker
+        """
+        url = self.url_template.replace("{x}", str(x)).replace("{y}", str(y)).replace("{z}", str(zoom))
+        try:
+            if inline:
+                response = scheduler.call_inline("tiles", self._get, url)
+            else:
+                response = scheduler.call("tiles", self._get, url, priority=priority)
+        except DroppedRequest:
+            return None
+        except Exception as e:
+            metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="tiles", outcome="error").inc()
+            print(f"Error downloading tile {zoom}/{x}/{y}: {e}")
+            return None
+
+        if response.status_code != 200 or not response.content:
+            metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="tiles", outcome="http_error").inc()
+            return None
+        metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="tiles", outcome="ok").inc()
+        return response.content
+
+    def _get(self, url):
+        import requests
+
+        with metrics.time("external_request_seconds", "Latency of outbound API calls", provider="tiles"):
+            return requests.get(url, headers={"User-Agent": "JunctionXUber/1.0 (Educational Project)"}, timeout=10)
+
+    def fetch(self, zoom, x, y, priority=INTERACTIVE, inline=False):
+        """
+        Returns the tile from the cache, downloading and storing it on a miss
+        """
+        data = self.get(zoom, x, y)
+        if data is not None:
+            return data
+        data = self.download(zoom, x, y, priority=priority, inline=inline)
+        if data is not None:
+            self.put(zoom, x, y, data)
+        return data
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class TilePrefetcher:
+    """
+    Downloads tiles through the request scheduler as prefetch requests, so they only use spare workers and quota
+    """
+    def __init__(self, cache, max_pending=512):
+        self.cache = cache
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def prefetch_around(self, coords, zooms=(15, 16), radius=2):
+        """
+        Queues every tile within radius tiles of the coordinate at the given zoom levels.
+        Tiles that are already cached or queued are skipped, and nothing is queued once max_pending is reached
+        """
+        queued = 0
+        for zoom in zooms:
+            center_x, center_y = deg_to_tile(coords[0], coords[1], zoom)
+            n = 2 ** zoom
+            for x in range(center_x - radius, center_x + radius + 1):
+                for y in range(center_y - radius, center_y + radius + 1):
+                    if 0 <= y < n and self._submit(zoom, x % n, y):
+                        queued += 1
+        return queued
+
+    def _submit(self, zoom, x, y):
+        key = (zoom, x, y)
+        with self._lock:
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending[key] = None
+        future = scheduler.submit("tiles", self._fetch, key, priority=PREFETCH)
+        with self._lock:
+            if key in self._pending:
+                self._pending[key] = future
+        future.add_done_callback(lambda done, key=key: self._done(key))
+        return True
+
+    def _fetch(self, key):
+        if not self.cache.contains(*key):
+            self.cache.fetch(*key, priority=PREFETCH)
+
+    def _done(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def shutdown(self):
+        """
+        Cancels the tiles that are still waiting in the scheduler
+        """
+        with self._lock:
+            futures = [future for future in self._pending.values() if future is not None]
+        for future in futures:
+            future.cancel()
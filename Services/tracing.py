@@ -0,0 +1,160 @@
+import cProfile
+import json
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+"This module records timing spans for the stages of a request so slow stages can be found"
+
+class Tracer:
+    def __init__(self, max_spans=10000):
+        self.enabled = True
+        self.profiling = False
+        self.spans = deque(maxlen=max_spans)
+        self._profiles = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._epoch = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, profile=False, **attributes):
+        """
+        Times the wrapped block and records it as a span with the given name.
+        When profiling is enabled and profile is True, the block also runs under cProfile
+        """
+        if not self.enabled:
+            yield
+            return
+
+        profiler = None
+        if profile and self.profiling and not getattr(self._local, "profiling", False):
+            profiler = cProfile.Profile()
+            self._local.profiling = True
+            profiler.enable()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if profiler is not None:
+                profiler.disable()
+                self._local.profiling = False
+                with self._lock:
+                    self._profiles.append(profiler)
+            self._record(name, start, end, attributes)
+
+    def traced(self, name=None, profile=False):
+        """
+        Decorator version of span, defaults to the name of the function
+        """
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, profile=profile):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _record(self, name, start, end, attributes):
+        record = {
+            "name": name,
+            "start_us": round((start - self._epoch) * 1e6, 1),
+            "duration_us": round((end - start) * 1e6, 1),
+            "thread": threading.get_ident(),
+        }
+        if attributes:
+            record["args"] = attributes
+        with self._lock:
+            self.spans.append(record)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self._profiles = []
+
+    def stage_percentiles(self, percentiles=(50, 90, 99)):
+        """
+        Returns the count and latency percentiles in milliseconds for every recorded stage
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        durations = {}
+        for record in spans:
+            durations.setdefault(record["name"], []).append(record["duration_us"] / 1000.0)
+
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            stats = {"count": len(values)}
+            for p in percentiles:
+                index = min(len(values) - 1, max(0, int(round(p / 100.0 * len(values) + 0.5)) - 1))
+                stats[f"p{p}"] = round(values[index], 2)
+            summary[name] = stats
+        return summary
+
+    def format_summary(self):
+        """
+        Formats the stage percentiles as a small table for printing
+        """
+        summary = self.stage_percentiles()
+        if not summary:
+            return "No spans recorded"
+
+        lines = [f"{'stage':<24}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"]
+        for name, stats in sorted(summary.items()):
+            lines.append(f"{name:<24}{stats['count']:>7}{stats['p50']:>10}{stats['p90']:>10}{stats['p99']:>10}")
+        return "\n".join(lines)
+
+    def export_jsonl(self, path):
+        """
+        Writes every recorded span as one JSON object per line
+        """
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, 'w', encoding='utf-8') as file:
+            for record in spans:
+                file.write(json.dumps(record) + "\n")
+
+    def export_chrome_trace(self, path):
+        """
+        Writes the recorded spans in the Chrome trace event format, viewable in chrome://tracing or Perfetto
+        """
+        with self._lock:
+            spans = list(self.spans)
+        events = []
+        for record in spans:
+            events.append({
+                "name": record["name"],
+                "ph": "X",
+                "ts": record["start_us"],
+                "dur": record["duration_us"],
+                "pid": 1,
+                "tid": record["thread"],
+                "args": record.get("args", {}),
+            })
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def dump_profile(self, path):
+        """
+        Merges all captured cProfile runs and writes them to a .prof file for pstats or snakeviz
+        """
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return False
+        stats = pstats.Stats(profiles[0])
+        for profiler in profiles[1:]:
+            stats.add(profiler)
+        stats.dump_stats(path)
+        return True
+
+
+tracer = Tracer()
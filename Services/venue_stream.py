@@ -0,0 +1,117 @@
+import codecs
+import json
+import re
+from array import array
+from Services.cluster_set import ClusterSet
+
+"This module parses Foursquare search responses as they stream in, straight into flat coordinate buffers"
+
+VENUE_FIELDS = "fsq_place_id,latitude,longitude"
+RESULTS_START = re.compile(r'"results"\s*:\s*\[')
+CHUNK_SIZE = 16384
+
+class VenueBuffer:
+    """
+    Preallocated float64 coordinate arrays plus the venue IDs, venues already in the buffer are skipped
+    """
+    def __init__(self, capacity=256):
+        self.lats = array('d', bytes(8 * capacity))
+        self.lons = array('d', bytes(8 * capacity))
+        self.ids = []
+        self.count = 0
+        self._slots = {}
+
+    def append(self, venue_id, lat, lon):
+        if venue_id is not None:
+            if venue_id in self._slots:
+                return False
+            self._slots[venue_id] = self.count
+        if self.count == len(self.lats):
+            growth = bytes(8 * max(len(self.lats), 64))
+            self.lats.frombytes(growth)
+            self.lons.frombytes(growth)
+        self.lats[self.count] = lat
+        self.lons[self.count] = lon
+        self.ids.append(venue_id)
+        self.count += 1
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.lats[i], self.lons[i]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("venue index out of range")
+        return self.lats[index], self.lons[index]
+
+    def to_cluster_set(self):
+        """
+        Returns a ClusterSet that shares the coordinate arrays of the buffer instead of copying them
+        """
+        del self.lats[self.count:]
+        del self.lons[self.count:]
+        return ClusterSet(self.lats, self.lons)
+
+
+def iter_results(chunks):
+    """
+    Yields the objects of the top-level "results" array of a JSON document that arrives as byte chunks,
+    decoding every object as soon as it is complete so the full payload is never held in memory
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    text = ""
+    position = None
+    for chunk in chunks:
+        text += text_decoder.decode(chunk)
+        if position is None:
+            match = RESULTS_START.search(text)
+            if match is None:
+                continue
+            position = match.end()
+
+        while True:
+            while position < len(text) and text[position] in " \t\r\n,":
+                position += 1
+            if position >= len(text):
+                break
+            if text[position] == "]":
+                return
+            try:
+                venue, position = decoder.raw_decode(text, position)
+            except json.JSONDecodeError:
+                # The object continues in the next chunk
+                break
+            yield venue
+
+        text = text[position:]
+        position = 0
+
+def parse_venues(response, venues):
+    """
+    Streams the venues of a search response into a VenueBuffer and returns the number of results in the response
+    """
+    try:
+        if response.status_code != 200:
+            print(f"Venue search failed with status code: {response.status_code}")
+            return 0
+
+        results = 0
+        for venue in iter_results(response.iter_content(chunk_size=CHUNK_SIZE)):
+            results += 1
+            lat = venue.get("latitude", None)
+            long = venue.get("longitude", None)
+
+            if not lat or not long:
+                continue
+
+            venues.append(venue.get("fsq_place_id"), lat, long)
+        return results
+    finally:
+        response.close()
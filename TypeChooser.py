@@ -1,17 +1,15 @@
 from datetime import datetime
+from functools import lru_cache
 import csv
 import os
 from Services.parsers import parse_time_string, parse_day_string
 
-def get_venue_type():
+@lru_cache(maxsize=1)
+def _load_schedule():
     """
-    Retrieves the types of venues which would theoretically be busy in the current hours and days. The returned list is a list of Category IDs
+    Reads the demand schedule once and returns it as a tuple of (category_id, start_time, end_time, valid_days)
     """
-    now = datetime.now()
-    current_hour = now.hour
-    current_weekday = now.weekday()
-    venue_types = []
-
+    schedule = []
     csv_file_path = os.path.join(os.path.dirname(__file__), "Data", "taxi_demand_categories_explicit.csv")
     with open(csv_file_path, 'r', encoding='utf-8') as file:
         reader = csv.DictReader(file)
@@ -19,12 +17,41 @@ def get_venue_type():
             start_time = parse_time_string(row['Start Time'].strip().strip('"').strip("'"))
             end_time = parse_time_string(row['End Time'].strip().strip('"').strip("'"))
             valid_days = parse_day_string(row['Days'])
-            
-            if current_weekday in valid_days:
-                if start_time > end_time:
-                    if current_hour >= start_time.hour or current_hour <= end_time.hour:
-                        venue_types.append(row['Category ID'])
-                elif start_time.hour <= current_hour <= end_time.hour:
-                    venue_types.append(row['Category ID'])
-        
-    return venue_types if venue_types else ["No venues open at this time"]    
+            schedule.append((row['Category ID'], start_time, end_time, valid_days))
+    return tuple(schedule)
+
+def get_venue_types_at(weekday, hour):
+    """
+    Retrieves the Category IDs of the venues which would theoretically be busy at the given weekday (0 is Monday) and hour
+    """
+    venue_types = []
+    for category_id, start_time, end_time, valid_days in _load_schedule():
+        if weekday in valid_days:
+            if start_time > end_time:
+                if hour >= start_time.hour or hour <= end_time.hour:
+                    venue_types.append(category_id)
+            elif start_time.hour <= hour <= end_time.hour:
+                venue_types.append(category_id)
+    return venue_types
+
+@lru_cache(maxsize=1)
+def build_weekly_schedule():
+    """
+    Returns the busy Category IDs for all 168 hours of the week, indexed by weekday * 24 + hour
+    """
+    return tuple(tuple(get_venue_types_at(hour_index // 24, hour_index % 24)) for hour_index in range(168))
+
+def get_all_venue_types():
+    """
+    Retrieves every Category ID that appears in the schedule
+    """
+    return sorted({row[0] for row in _load_schedule()})
+
+def get_venue_type(now=None):
+    """
+    Retrieves the types of venues which would theoretically be busy in the current hours and days. The returned list is a list of Category IDs
+    """
+    now = now or datetime.now()
+    venue_types = list(build_weekly_schedule()[now.weekday() * 24 + now.hour])
+
+    return venue_types if venue_types else ["No venues open at this time"]
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Venue Clustering for JunctionX-Uber Project
+
+This script clusters a city-scale venue file (CSV with a header row or JSON lines) into busy areas
+with the same rules as the application. Large files are clustered in parallel longitude strips on a process pool.
+
+Usage:
+    python cluster_venues.py VENUES [--out Data/clusters.json] [--cluster-difference 1.5] [--workers N]
+
+Example:
+    python cluster_venues.py amsterdam_venues.csv --workers 8
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+from process_logic import CLUSTER_DIFFERENCE, PARALLEL_MIN_VENUES, ProcessLogic
+from Services.venue_stream import VenueBuffer
+
+LAT_FIELDS = ("lat", "latitude")
+LON_FIELDS = ("lon", "lng", "longitude")
+
+def read_venues(path):
+    """
+    Reads the venue coordinates of a CSV or JSON-lines file into a VenueBuffer, rows without coordinates are skipped
+    """
+    venues = VenueBuffer()
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        first = file.readline()
+        if first.lstrip().startswith("{"):
+            rows = (json.loads(line) for line in itertools.chain([first], file) if line.strip())
+        else:
+            rows = csv.DictReader(itertools.chain([first], file))
+        for row in rows:
+            fields = {name.lower(): value for name, value in row.items() if name}
+            lat = next((fields[name] for name in LAT_FIELDS if fields.get(name) not in (None, "")), None)
+            lon = next((fields[name] for name in LON_FIELDS if fields.get(name) not in (None, "")), None)
+            try:
+                venues.append(fields.get("fsq_place_id"), float(lat), float(lon))
+            except (TypeError, ValueError):
+                continue
+    return venues
+
+def main():
+    """Main function to cluster the venues and save the busy areas."""
+    parser = argparse.ArgumentParser(description="Cluster a city-scale venue file into busy areas")
+    parser.add_argument("venues", help="CSV or JSON-lines file with the venue coordinates")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data", "clusters.json"),
+                        help="output JSON file")
+    parser.add_argument("--cluster-difference", type=float, default=CLUSTER_DIFFERENCE, help="cluster distance in kilometers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help=f"processes to cluster on, used from {PARALLEL_MIN_VENUES} venues")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.venues):
+        print(f"Error: {args.venues} not found")
+        sys.exit(1)
+    if args.cluster_difference <= 0 or args.workers < 1:
+        print("Error: the cluster difference and the number of workers must be positive")
+        sys.exit(1)
+
+    print("Venue Clustering")
+    print("=" * 50)
+    venues = read_venues(args.venues)
+    print(f"Clustering {len(venues)} venues on {args.workers if len(venues) >= PARALLEL_MIN_VENUES else 1} processes")
+
+    clusters = ProcessLogic(workers=args.workers).cluster_maker(venues, args.cluster_difference)
+    areas = sorted(({"center": list(cluster.center), "venues": len(cluster)} for cluster in clusters),
+                   key=lambda area: area["venues"], reverse=True)
+    with open(args.out, 'w', encoding='utf-8') as file:
+        json.dump(areas, file)
+    print(f"Saved {len(areas)} busy areas to {args.out}")
+
+if __name__ == "__main__":
+    main()
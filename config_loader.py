@@ -16,4 +16,21 @@ class ConfigLoader():
             raise FileNotFoundError(f"Config file {filename} not found")
     
     def get_key(self):
-        return self.config["fourSquareAPIKey"]
\ No newline at end of file
+        return self.config["fourSquareAPIKey"]
+
+    def get_regions(self):
+        """
+        Returns the city regions of the config, each with a name and a bbox of [south, west, north, east]
+        """
+        regions = self.config.get("regions", [])
+        for region in regions:
+            name = region.get("name")
+            if not name:
+                raise ValueError(f"Every region needs a name, found {region}")
+            bbox = region.get("bbox")
+            if not isinstance(bbox, list) or len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+                raise ValueError(f"Region {name} needs a bbox of [south, west, north, east]")
+        return regions
+
+    def get_max_loaded_regions(self):
+        return self.config.get("maxLoadedRegions", 2)
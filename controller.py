@@ -1,51 +1,185 @@
-import geopy.distance
 import math
+import threading
+from contextlib import nullcontext
+from datetime import datetime
 from TypeChooser import get_venue_type
+from Services.metrics import metrics
+from Services.tracing import tracer
+from Services.query_planner import QueryPlanner
+from Services.scheduler import INTERACTIVE
+from Services.venue_stream import VENUE_FIELDS, VenueBuffer, parse_venues
+
+PARKING_CATEGORY_ID = "4c38df4de52ce0d596b336e1"
+IDLE_SEARCH_RADIUS_KM = 1.0
+IDLE_PAGE_LIMIT = 50
+# Searches the bulk parking lookup may make, clusters it does not reach are searched when they are clicked
+IDLE_MAX_SEARCHES = 8
+KM_PER_DEGREE = 111.0
 
 class Controller:
-    def __init__(self, client):
-        self.busy_address = (52.07515870380299, 4.3082185994332525)
-        self.idle_address = (51.85096345959651, 4.543824271176097)
-        self.client = client
+    def __init__(self, client=None, client_factory=None, regions=None, regions_factory=None):
+        self._busy_address = None
+        self._idle_address = None
+        self._client = client
+        self._client_factory = client_factory
+        self._client_lock = threading.Lock()
+        self._regions = regions
+        self._regions_factory = regions_factory
+        self._regions_lock = threading.Lock()
+        self.demand_grid = None
+        self.pickup_prior = None
+        self.query_planner = QueryPlanner()
+
+    @property
+    def client(self):
+        """
+        The API client, built by the client factory on first use so startup does not wait for it
+        """
+        if self._client is None and self._client_factory is not None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    @property
+    def regions(self):
+        """
+        The region registry, built by the regions factory on first use so startup does not read the config
+        """
+        if self._regions_factory is not None:
+            with self._regions_lock:
+                if self._regions_factory is not None:
+                    self._regions = self._regions_factory()
+                    self._regions_factory = None
+        return self._regions
+
+    @property
+    def busy_address(self):
+        if self._busy_address is None and self.regions is not None and self.regions.regions:
+            return self.regions.regions[0].busy_address
+        return self._busy_address
+
+    @property
+    def idle_address(self):
+        if self._idle_address is None and self.regions is not None and self.regions.regions:
+            return self.regions.regions[0].idle_address
+        return self._idle_address
+
+    def region_state(self, coords):
+        """
+        Context manager holding the warm state of the configured region containing the coordinate, loaded on first use,
+        so it is not closed while the block uses it. Gives None outside every region
+        """
+        if self.regions is None:
+            return nullcontext()
+        return self.regions.using(coords)
+
+    def acquire_region_state(self, coords):
+        """
+        The state of the region containing the coordinate, kept loaded until release_region_state, or None
+        """
+        region = self.region_for(coords)
+        return self.regions.acquire(region) if region is not None else None
 
+    def release_region_state(self, state):
+        if state is not None:
+            self.regions.release(state)
 
+    def close(self):
+        """
+        Closes the region states, without building the registry when it was never used
+        """
+        if self._regions_factory is None and self._regions is not None:
+            self._regions.close()
+
+    def region_for(self, coords):
+        """
+        The configured region containing the coordinate without loading its state, or None
+        """
+        return self.regions.region_for(coords) if self.regions is not None else None
+
+    def cluster_difference_for(self, coords):
+        from process_logic import CLUSTER_DIFFERENCE
+
+        region = self.region_for(coords)
+        return region.cluster_difference if region is not None else CLUSTER_DIFFERENCE
+
+    def load_demand_grid(self, path):
+        """
+        Loads a demand grid written by precompute_demand.py
+        """
+        from Services.demand_grid import DemandGrid
+
+        self.demand_grid = DemandGrid.load(path)
+
+    def load_pickup_prior(self, path):
+        """
+        Loads the pickup counters written by ingest_pickups.py, used as a demand prior when scoring clusters
+        """
+        from Services.pickup_prior import PickupPrior
+
+        self.pickup_prior = PickupPrior.load(path)
+
+    @tracer.traced("getLocations")
     def getLocations(self, current_coords):
         """
-        Gets all the close locations to go to at the given time
+        Gets all the close locations to go to at the given time, the query planner picks the search radius
+        from the venue density seen before in the area. Returns a VenueBuffer with the coordinates.
+        Inside a configured region recent searches of the same area are reused
         """
         types = ""
         venue_types = get_venue_type()
         if venue_types and venue_types[0] != "No venues open at this time":
             types = ",".join(venue_types)
 
-        params = {
-            "ll": f"{current_coords[0]},{current_coords[1]}",
-            "radius": 10000,
-            "limit": 50,
-            "open_now": True,
-            "fsq_category_ids": types
-        }
+        with self.region_state(current_coords) as state:
+            planner = state.query_planner if state is not None else self.query_planner
+            if state is not None:
+                cached = state.venue_cache.get(current_coords, types)
+                if cached is not None:
+                    return cached
 
-        response = self.client.getNearbyLocations(params)
-        result = response.json().get("results", [])
-        result_coords = []
+            def fetch(center, radius):
+                params = {
+                    "ll": f"{center[0]},{center[1]}",
+                    "radius": radius,
+                    "limit": planner.page_limit,
+                    "open_now": True,
+                    "fsq_category_ids": types,
+                    "fields": VENUE_FIELDS
+                }
 
-        for i in result:
-            lat = i.get("latitude", None)
-            long = i.get("longitude", None)
+                response = self.client.getNearbyLocations(params, stream=True)
+                return parse_venues(response, venues)
 
-            if not lat or not long:
-                continue
-
-            result_coords.append((lat, long))
-
-        return result_coords
+            venues = VenueBuffer(planner.target_count + planner.page_limit)
+            planner.search(current_coords, types, fetch, venues)
+            if state is not None:
+                state.venue_cache.put(current_coords, types, venues)
+            return venues
 
     def set_busy_address(self, addr):
-        self.busy_address = addr
+        self._busy_address = addr
 
     def set_idle_address(self, addr):
-        self.idle_address = addr
+        self._idle_address = addr
+
+    def score_clusters(self, clusters, current_coords, when=None):
+        """
+        Scores every cluster by its number of venues divided by the square root of its distance in km,
+        weighted by the historical pickups around the cluster at this hour of the week when a pickup prior is loaded
+        """
+        import geopy.distance
+        from Services.pickup_prior import demand_multiplier
+
+        when = when or datetime.now()
+        scores = []
+        with self.region_state(current_coords) as state, tracer.span("scoring", clusters=len(clusters)):
+            prior = state.pickup_prior if state is not None and state.pickup_prior is not None else self.pickup_prior
+            for i in clusters:
+                distance = max(round(geopy.distance.geodesic(current_coords, i.center).km, 3), 0.001)
+                scores.append(len(i) / math.sqrt(distance) * demand_multiplier(prior, i.center, when))
+        return scores
 
     def get_busy_address(self, clusters, current_coords):
         """
@@ -54,50 +188,120 @@ class Controller:
         if not clusters:
             return None
         
-        scores = []
-        for i in clusters:
-            scores.append((len(i[0]) / math.sqrt(round(geopy.distance.geodesic(current_coords, i[1]).km, 3))))
+        scores = self.score_clusters(clusters, current_coords)
 
-        return clusters[scores.index(max(scores))][1]
+        return clusters[scores.index(max(scores))].center
 
 
+    @tracer.traced("get_idling_place")
     def get_idling_place(self, area_coords):
         p = {
             "ll": f"{area_coords[0]},{area_coords[1]}",
-            "radius": 1000,
+            "radius": int(IDLE_SEARCH_RADIUS_KM * 1000),
             "limit": 10,
             "open_now": True,
-            "fsq_category_ids": "4c38df4de52ce0d596b336e1",
-            "sort": "DISTANCE"
+            "fsq_category_ids": PARKING_CATEGORY_ID,
+            "sort": "DISTANCE",
+            "fields": VENUE_FIELDS
         }
 
-        response = self.client.getNearbyLocations(p)
-        result = response.json().get("results", [])
-        result_coords = []
+        venues = VenueBuffer(10)
+        parse_venues(self.client.getNearbyLocations(p, stream=True), venues)
+
+        if not venues:
+            return None
 
-        for i in result:
+        return venues[0]
 
-            lat = i.get("latitude", None)
-            long = i.get("longitude", None)
+    @tracer.traced("get_idling_places")
+    def get_idling_places(self, clusters, max_searches=IDLE_MAX_SEARCHES, priority=INTERACTIVE):
+        """
+        Finds the closest open parking place within 1 km of the clusters. The bounding box of the clusters is searched
+        first and split in two along its longest side while a search fills a whole page, because a full page is an
+        arbitrary slice of the box. A single cluster whose box is still full gets a search sorted by distance.
+        After max_searches the remaining clusters are left out. The searches wait in the scheduler with the given priority. Returns a dictionary from the center of every covered
+        cluster to its parking place, or None when there is no parking within 1 km
+        """
+        if not clusters:
+            return {}
 
-            if not lat or not long:
-                continue
+        from Services.spatial_index import GridIndex
 
-            result_coords.append((lat, long))
+        centers = [cluster.center for cluster in clusters]
+        cos_lat = math.cos(math.radians(centers[0][0]))
+        margin_lat = IDLE_SEARCH_RADIUS_KM / KM_PER_DEGREE
+        margin_lon = IDLE_SEARCH_RADIUS_KM / (KM_PER_DEGREE * cos_lat)
+        venues = VenueBuffer(IDLE_PAGE_LIMIT)
+        groups = [centers]
+        covered = []
+        searches = 0
+        while groups and searches < max_searches:
+            group = groups.pop()
+            searches += 1
+            if len(group) == 1:
+                params = {
+                    "ll": f"{group[0][0]},{group[0][1]}",
+                    "radius": int(IDLE_SEARCH_RADIUS_KM * 1000),
+                    "sort": "DISTANCE",
+                }
+            else:
+                params = {
+                    "ne": f"{max(c[0] for c in group) + margin_lat},{max(c[1] for c in group) + margin_lon}",
+                    "sw": f"{min(c[0] for c in group) - margin_lat},{min(c[1] for c in group) - margin_lon}",
+                }
+            params.update({"limit": IDLE_PAGE_LIMIT, "open_now": True, "fsq_category_ids": PARKING_CATEGORY_ID, "fields": VENUE_FIELDS})
+            count = parse_venues(self.client.getNearbyLocations(params, stream=True, priority=priority), venues)
 
-        if not result_coords:
-            return None
+            if count < IDLE_PAGE_LIMIT or len(group) == 1:
+                covered.extend(group)
+            elif searches < max_searches:
+                lat_km = (max(c[0] for c in group) - min(c[0] for c in group)) * KM_PER_DEGREE
+                lon_km = (max(c[1] for c in group) - min(c[1] for c in group)) * KM_PER_DEGREE * cos_lat
+                axis = 0 if lat_km >= lon_km else 1
+                group = sorted(group, key=lambda c: c[axis])
+                middle = len(group) // 2
+                groups.extend((group[:middle], group[middle:]))
 
-        return result_coords[0]
+        metrics.counter("idle_place_searches_total", "Parking searches made to cover the clusters").inc(searches)
+        index = GridIndex(venues, cell_km=IDLE_SEARCH_RADIUS_KM / 2)
+        return dict(zip(covered, index.nearest_all(covered, IDLE_SEARCH_RADIUS_KM)))
 
     def get_idle_address(self, clusters, current_coords):
         if not clusters:
             return None
         
-        scores = []
-        for i in clusters:
-            scores.append((len(i[0]) / math.sqrt(round(geopy.distance.geodesic(current_coords, i[1]).km, 3))))
+        scores = self.score_clusters(clusters, current_coords)
+
+        busy_location =  clusters[scores.index(max(scores))].center
+
+        return self.get_idling_place(busy_location)
 
-        busy_location =  clusters[scores.index(max(scores))][1]
+    def get_best_nearby_area(self, current_coords, when=None):
+        """
+        Finds the best nearby busy area from the precomputed demand grid,
+        and falls back to fetching and clustering live venues when the grid does not cover the location
+        """
+        with self.region_state(current_coords) as state:
+            demand_grid = state.demand_grid if state is not None and state.demand_grid is not None else self.demand_grid
+            best = None
+            if demand_grid is not None:
+                with tracer.span("demand_grid_lookup"):
+                    best = demand_grid.best_nearby(current_coords, when)
+        if best is not None:
+            return best
+
+        from process_logic import ProcessLogic
+
+        clusters = ProcessLogic().cluster_maker(self.getLocations(current_coords), self.cluster_difference_for(current_coords))
+        return self.get_busy_address(clusters, current_coords)
+
+    def assign_drivers(self, driver_positions, clusters):
+        """
+        Spreads several drivers over the clusters, each cluster taking a share proportional to its venue count,
+        while keeping the total driving distance minimal. Returns the assigned cluster center for every driver
+        """
+        from Services.fleet_assignment import assign_drivers
 
-        return self.get_idling_place(busy_location)
\ No newline at end of file
+        with tracer.span("fleet_assignment", drivers=len(driver_positions), clusters=len(clusters)):
+            indices = assign_drivers(driver_positions, clusters)
+        return [clusters[i].center if i is not None else None for i in indices]
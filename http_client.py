@@ -1,4 +1,5 @@
-import requests
+from Services.metrics import metrics
+from Services.scheduler import INTERACTIVE, DroppedRequest, scheduler
 
 class FoursquareClient:
     def __init__(self, key):
@@ -9,7 +10,26 @@ class FoursquareClient:
             "X-Places-Api-Version": "2025-06-17",
             "Accept": "application/json"
         }
-        
-    def getNearbyLocations(self, params=None):
-        response = requests.get(self.url, headers=self.headers, params=params)
-        return response
\ No newline at end of file
+
+    def getNearbyLocations(self, params=None, stream=False, priority=INTERACTIVE):
+        """
+        Searches for places, with stream the body is left unread so it can be parsed while it downloads.
+        The request waits in the request scheduler with the given priority class
+        """
+        try:
+            response = scheduler.call("foursquare", self._get, params, stream, priority=priority)
+        except DroppedRequest:
+            raise
+        except Exception:
+            metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="foursquare", outcome="error").inc()
+            raise
+
+        outcome = "ok" if response.status_code == 200 else "http_error"
+        metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="foursquare", outcome=outcome).inc()
+        return response
+
+    def _get(self, params, stream):
+        import requests
+
+        with metrics.time("external_request_seconds", "Latency of outbound API calls", provider="foursquare"):
+            return requests.get(self.url, headers=self.headers, params=params, stream=stream)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Pickup Log Ingestion for JunctionX-Uber Project
+
+This script streams historical pickup logs (CSV with a header row or JSON lines, optionally gzipped)
+into decayed pickup counters per geohash cell and hour of the week.
+The application memory-maps the result and uses it as a demand prior when scoring busy areas.
+
+Usage:
+    python ingest_pickups.py LOG [LOG ...] [--out Data/pickup_prior] [--half-life-days 28] [--timezone ZONE] [--fresh]
+
+Example:
+    python ingest_pickups.py pickups_2024.csv.gz --lat-field pickup_latitude --lon-field pickup_longitude
+    python ingest_pickups.py pickups.jsonl --timezone Europe/Amsterdam
+"""
+
+import argparse
+import os
+import sys
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from Services.pickup_prior import PickupAggregator, PickupPrior, read_pickups
+
+def main():
+    """Main function to ingest the logs and save the pickup prior."""
+    parser = argparse.ArgumentParser(description="Aggregate pickup logs into a demand prior")
+    parser.add_argument("logs", nargs="+", help="pickup log files")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data", "pickup_prior"),
+                        help="output path without extension")
+    parser.add_argument("--precision", type=int, default=6, help="geohash precision of the cells")
+    parser.add_argument("--half-life-days", type=float, default=28.0, help="age after which a pickup counts half")
+    parser.add_argument("--lat-field", help="name of the latitude column")
+    parser.add_argument("--lon-field", help="name of the longitude column")
+    parser.add_argument("--time-field", help="name of the pickup time column")
+    parser.add_argument("--timezone", help="IANA timezone of the pickups, needed for unix timestamps and "
+                                           "used to convert ISO times with an offset (default: keep their own time)")
+    parser.add_argument("--fresh", action="store_true", help="ignore the existing prior instead of adding to it")
+    args = parser.parse_args()
+
+    if args.precision < 1 or args.precision > 12 or args.half_life_days <= 0:
+        print("Error: the precision must be between 1 and 12 and the half-life positive")
+        sys.exit(1)
+
+    timezone = None
+    if args.timezone:
+        try:
+            timezone = ZoneInfo(args.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            print(f"Error: unknown timezone {args.timezone}")
+            sys.exit(1)
+
+    aggregator = PickupAggregator(args.precision, args.half_life_days)
+    if not args.fresh and os.path.exists(args.out + ".json"):
+        prior = PickupPrior.load(args.out)
+        try:
+            aggregator.merge_prior(prior)
+        except ValueError as e:
+            print(f"Error: {e}, use --fresh to start over")
+            sys.exit(1)
+        finally:
+            prior.close()
+        print(f"Added to the existing prior with {len(prior.cells)} cells")
+
+    def progress(events):
+        print(f"\rPickups ingested: {events}", end="", flush=True)
+
+    print("Pickup Log Ingestion")
+    print("=" * 50)
+    for path in args.logs:
+        if not os.path.exists(path):
+            print(f"Error: {path} not found")
+            sys.exit(1)
+        try:
+            aggregator.add_all(read_pickups(path, args.lat_field, args.lon_field, args.time_field, timezone), progress)
+        except ValueError as e:
+            print(f"\nError reading {path}: {e}, pass --timezone")
+            sys.exit(1)
+
+    aggregator.save(args.out)
+    print(f"\nSaved {aggregator.events} pickups in {len(aggregator.counts)} cells to {args.out}.bin")
+
+if __name__ == "__main__":
+    main()
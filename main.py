@@ -1,14 +1,108 @@
+import argparse
+import os
 import tkinter as tk
 from controller import Controller
-from http_client import FoursquareClient
 from config_loader import ConfigLoader
+from Services.tracing import tracer
+from Services.metrics import metrics
 from ui import App
 
-config = ConfigLoader("configs/config.json")
-fourSquareAPIKey = config.get_key()
-client = FoursquareClient(fourSquareAPIKey)
+def build_client():
+    """
+    Reads the config and builds the Foursquare client, called on the first request instead of at startup
+    """
+    from http_client import FoursquareClient
 
-controller = Controller(client)
-app = App(controller)
+    config = ConfigLoader("configs/config.json")
+    return FoursquareClient(config.get_key())
 
-app.start()
\ No newline at end of file
+def build_regions():
+    """
+    Builds the region registry from the regions in the config, or returns None when there are none.
+    Called on the first region lookup instead of at startup
+    """
+    from Services.regions import RegionRegistry
+
+    try:
+        config = ConfigLoader("configs/config.json")
+        regions = config.get_regions()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error loading regions: {e}")
+        return None
+    if not regions:
+        return None
+    return RegionRegistry.from_config(regions, config.get_max_loaded_regions())
+
+def main():
+    """Main function to start the app and write the traces and metrics on exit."""
+    parser = argparse.ArgumentParser(description="Uber Driver Assistant")
+    parser.add_argument("--trace", action="store_true", help="print per-stage latency percentiles on exit")
+    parser.add_argument("--trace-jsonl", metavar="PATH", help="write recorded spans as JSON lines on exit")
+    parser.add_argument("--chrome-trace", metavar="PATH", help="write recorded spans as a Chrome trace file on exit")
+    parser.add_argument("--profile", metavar="PATH", help="capture cProfile data for each request and write it on exit")
+    parser.add_argument("--metrics-out", metavar="PATH", help="write metrics in the Prometheus text format on exit")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT", help="serve metrics in the Prometheus text format on /metrics")
+    parser.add_argument("--demand-grid", metavar="PATH", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data", "demand_grid"), help="demand grid written by precompute_demand.py")
+    parser.add_argument("--pickup-prior", metavar="PATH", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data", "pickup_prior"), help="pickup counters written by ingest_pickups.py")
+    parser.add_argument("--query-stats", metavar="PATH", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data", "query_stats.json"), help="venue density per area kept between runs to pick the search radius")
+    parser.add_argument("--gps-replay", metavar="PATH", help="follow the positions in a CSV or JSON-lines file")
+    parser.add_argument("--gps-socket", metavar="HOST:PORT", help="follow the positions sent by a TCP feed")
+    parser.add_argument("--startup-bench", action="store_true", help="print startup marks and exit once the map is ready")
+    args = parser.parse_args()
+
+    tracer.profiling = bool(args.profile)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    controller = Controller(client_factory=build_client, regions_factory=build_regions)
+    if os.path.exists(args.demand_grid + ".json"):
+        controller.load_demand_grid(args.demand_grid)
+    if os.path.exists(args.pickup_prior + ".json"):
+        controller.load_pickup_prior(args.pickup_prior)
+    if os.path.exists(args.query_stats):
+        controller.query_planner.load(args.query_stats)
+    app = App(controller)
+
+    if args.gps_replay or args.gps_socket:
+        def start_gps(event=None):
+            from Services.gps_stream import replay_file, socket_positions
+
+            if args.gps_replay:
+                positions = replay_file(args.gps_replay, realtime=True)
+            else:
+                host, port = args.gps_socket.rsplit(":", 1)
+                positions = socket_positions(host, int(port))
+            app.follow_gps(positions)
+
+        app.bind("<<MapReady>>", start_gps, add="+")
+
+    if args.startup_bench:
+        def report_first_frame(event):
+            if event.widget is app:
+                print("first_frame", flush=True)
+                app.unbind("<Map>")
+
+        def report_map_ready(event=None):
+            print("map_ready", flush=True)
+            app.after(0, app.on_closing)
+
+        app.bind("<Map>", report_first_frame)
+        app.bind("<<MapReady>>", report_map_ready, add="+")
+
+    app.start()
+    controller.query_planner.save(args.query_stats)
+    controller.close()
+
+    if args.trace:
+        print(tracer.format_summary())
+    if args.trace_jsonl:
+        tracer.export_jsonl(args.trace_jsonl)
+    if args.chrome_trace:
+        tracer.export_chrome_trace(args.chrome_trace)
+    if args.profile:
+        tracer.dump_profile(args.profile)
+    if args.metrics_out:
+        metrics.write_prometheus(args.metrics_out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import io
+from PIL import Image, ImageTk
+from tkintermapview import TkinterMapView
+
+class CachedMapView(TkinterMapView):
+    """
+    Map widget that reads tiles through a TileCache, so tiles seen in earlier sessions load from disk
+    """
+    def __init__(self, *args, tile_cache=None, **kwargs):
+        self.tile_cache = tile_cache
+        super().__init__(*args, **kwargs)
+
+    def request_image(self, zoom, x, y, db_cursor=None):
+        if self.tile_cache is None or self.tile_server != self.tile_cache.url_template or self.overlay_tile_server is not None:
+            return super().request_image(zoom, x, y, db_cursor=db_cursor)
+
+        try:
+            # The widget loads tiles on its own threads, so they only take quota and leave the shared workers to the API calls
+            data = self.tile_cache.fetch(zoom, x, y, inline=True)
+            if data is None:
+                return super().request_image(zoom, x, y, db_cursor=db_cursor)
+            image_tk = ImageTk.PhotoImage(Image.open(io.BytesIO(data)))
+        except Exception as e:
+            print(f"Error reading cached tile {zoom}/{x}/{y}: {e}")
+            return super().request_image(zoom, x, y, db_cursor=db_cursor)
+
+        self.tile_image_cache[f"{zoom}{x}{y}"] = image_tk
+        return image_tk
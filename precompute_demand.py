@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Demand Grid Precomputation for JunctionX-Uber Project
+
+This script walks a city grid, counts the venues of every scheduled category per cell
+with the Foursquare API and writes a demand raster for all 168 hours of the week.
+The application memory-maps the result and answers "best nearby area" without API calls.
+
+Usage:
+    python precompute_demand.py --bbox SOUTH WEST NORTH EAST [--cell-km 1.0] [--out Data/demand_grid]
+
+Example (The Hague and Delft):
+    python precompute_demand.py --bbox 51.98 4.20 52.12 4.42
+"""
+
+import argparse
+import os
+import sys
+from config_loader import ConfigLoader
+from http_client import FoursquareClient
+from Services.demand_grid import build_demand_grid, count_venues
+from TypeChooser import build_weekly_schedule, get_all_venue_types
+
+def main():
+    """Main function to build and save the demand grid."""
+    parser = argparse.ArgumentParser(description="Precompute the weekly demand grid for a city")
+    parser.add_argument("--bbox", type=float, nargs=4, required=True, metavar=("SOUTH", "WEST", "NORTH", "EAST"))
+    parser.add_argument("--cell-km", type=float, default=1.0, help="size of a grid cell in kilometers")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data", "demand_grid"),
+                        help="output path without extension")
+    args = parser.parse_args()
+
+    south, west, north, east = args.bbox
+    if south >= north or west >= east or args.cell_km <= 0:
+        print("Error: the bounding box must be SOUTH WEST NORTH EAST with a positive cell size")
+        sys.exit(1)
+
+    config = ConfigLoader("configs/config.json")
+    client = FoursquareClient(config.get_key())
+    category_ids = get_all_venue_types()
+
+    def venue_counter(coords, radius_m, category_id):
+        return count_venues(client, coords, radius_m, category_id)
+
+    def progress(done, total):
+        print(f"\rCells done: {done}/{total}", end="", flush=True)
+
+    print("Demand Grid Precomputation")
+    print("=" * 50)
+    grid = build_demand_grid(args.bbox, args.cell_km, venue_counter, build_weekly_schedule(), category_ids, progress)
+    grid.save(args.out)
+    print(f"\nSaved {grid.rows}x{grid.cols} grid for {len(category_ids)} categories to {args.out}.bin")
+    if grid.saturated:
+        print(f"{len(grid.saturated)} cells still had full result pages, their demand is a lower bound, use a smaller --cell-km there")
+
+if __name__ == "__main__":
+    main()
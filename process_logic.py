@@ -1,9 +1,19 @@
-import geopy.distance
-import requests
+from Services.tracing import tracer
+from Services.metrics import metrics
+from Services.cluster_set import ClusterSet
+from Services.venue_stream import VenueBuffer
+
+CLUSTER_DIFFERENCE = 1.5
+# Below this many venues starting the process pool costs more than it saves
+PARALLEL_MIN_VENUES = 5000
 
 class ProcessLogic:
-    
+    def __init__(self, workers=None):
+        self.workers = workers
+
     def distance_finder(self, coords1, coords2):
+        import geopy.distance
+
         return round(geopy.distance.geodesic(coords1, coords2).km, 3)
 
     def cluster_average(self, cluster_coords):
@@ -21,73 +31,78 @@ class ProcessLogic:
             
         return sum(lat) / len(lat), sum(long) / len(long)
 
-    def cluster_merger(self, clusters, cluster_difference, index):
+    def cluster_merger(self, cluster_set, cluster_difference, index):
         """
-        Merges two clusters if they are close enough to eachother
+        Merges the cluster at the given position with every cluster that is close enough to it,
+        the merged cluster is moved to the front of the cluster order
         """
-        if(len(clusters) <=1 or cluster_difference <= 0 or index >= len(clusters)):
+        order = cluster_set.order
+        if(len(order) <= 1 or cluster_difference <= 0 or index >= len(order)):
             return None
         changed = False
-        untouched_clusters = clusters.copy()
-        new_clusters = []
+        untouched_clusters = order.copy()
 
         current_cluster = untouched_clusters.pop(index)
         for i in range(len(untouched_clusters) - 1, -1, -1):
-            if (self.distance_finder(current_cluster[1], untouched_clusters[i][1]) <= 2 * cluster_difference):
+            if (self.distance_finder(cluster_set.center(current_cluster), cluster_set.center(untouched_clusters[i])) <= 2 * cluster_difference):
                 added_cluster = untouched_clusters.pop(i)
-
-                cluster_1_len = len(current_cluster[0])
-                cluster_2_len = len(added_cluster[0])
-
-                new_average_lan = (current_cluster[1][0] * cluster_1_len + added_cluster[1][0] * cluster_2_len) / (cluster_1_len + cluster_2_len)
-                new_average_long = (current_cluster[1][1] * cluster_1_len + added_cluster[1][1] * cluster_2_len) / (cluster_1_len + cluster_2_len)
-
-                current_cluster = (current_cluster[0] + added_cluster[0], (new_average_lan, new_average_long))
+                current_cluster = cluster_set.union(current_cluster, added_cluster)
                 changed = True
 
         if not changed:
             return None
 
-        new_clusters.append(current_cluster)
-        if untouched_clusters:
-            for i in untouched_clusters:
-                new_clusters.append(i)
-        return new_clusters
+        cluster_set.order = [current_cluster] + untouched_clusters
+        return cluster_set
 
-    def cluster_maker(self, places):
+    @tracer.traced("cluster_maker")
+    def cluster_maker(self, places, cluster_difference=CLUSTER_DIFFERENCE):
         """
-        Makes a new cluster from all the places in the area
+        Makes a new cluster from all the places in the area, returned as a ClusterSet.
+        With workers set, large inputs are clustered in parallel strips on a process pool
         """
-        if not places:
-            return []
-        
-        untouched_coords = places.copy()
-        clusters = []
-        cluster_difference = 1.5
+        if isinstance(places, VenueBuffer):
+            places = places.to_cluster_set()
+        venue_count = places.total_venues() if isinstance(places, ClusterSet) else len(places or [])
+        if venue_count == 0:
+            return ClusterSet([], [])
+
+        with metrics.time("clustering_seconds", "Duration of a full clustering run"):
+            if self.workers and self.workers > 1 and venue_count >= PARALLEL_MIN_VENUES:
+                from Services.parallel_clustering import parallel_cluster
+
+                cluster_set = places if isinstance(places, ClusterSet) else ClusterSet.from_points(places)
+                clusters = parallel_cluster(cluster_set, cluster_difference, self.distance_finder, self.workers)
+            else:
+                clusters = self._make_clusters(places, cluster_difference)
+
+        metrics.counter("clustering_venues_total", "Venues passed to the clusterer").inc(venue_count)
+        metrics.gauge("clustering_last_cluster_count", "Clusters produced by the last clustering run").set(len(clusters))
+        return clusters
+
+    def _make_clusters(self, places, cluster_difference=CLUSTER_DIFFERENCE):
+        cluster_set = places if isinstance(places, ClusterSet) else ClusterSet.from_points(places)
+        untouched_coords = list(range(cluster_set.total_venues()))
 
         while len(untouched_coords) != 0:
-            current_item = untouched_coords.pop()
-            single_cluster = [current_item]
-            cluster_center = current_item
-            
-            for i in range(len(untouched_coords) - 1, -1, -1):
-                coords = untouched_coords[i]
-                if self.distance_finder(cluster_center, coords) <= cluster_difference:
-                    single_cluster.append(untouched_coords.pop(i))
-                    cluster_center = self.cluster_average(single_cluster)
+            current_cluster = cluster_set.new_cluster(untouched_coords.pop())
+            cluster_center = cluster_set.center(current_cluster)
 
-            clusters.append((single_cluster, cluster_center))
+            for i in range(len(untouched_coords) - 1, -1, -1):
+                point = untouched_coords[i]
+                if self.distance_finder(cluster_center, (cluster_set.lats[point], cluster_set.lons[point])) <= cluster_difference:
+                    cluster_set.add_point(current_cluster, untouched_coords.pop(i))
+                    cluster_center = cluster_set.center(current_cluster)
 
         index = 0
         while(True):
-            result = self.cluster_merger(clusters, cluster_difference, index)
+            result = self.cluster_merger(cluster_set, cluster_difference, index)
             if result is None:
                 index += 1
-                if(index >= len(clusters)):
+                if(index >= len(cluster_set)):
                     break
                 continue
             else:
-                clusters = result
                 continue
 
-        return clusters
\ No newline at end of file
+        return cluster_set
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark for JunctionX-Uber Project
+
+This script launches the application with -X importtime and --startup-bench,
+measures the wall time until the first frame and until the map is ready,
+and lists the slowest imports so time-to-first-frame stays tracked.
+
+Usage:
+    python startup_benchmark.py [--runs 5] [--top 15] [--record startup_history.jsonl]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+def parse_importtime(stderr_text):
+    """Parse -X importtime output into a list of (cumulative_us, self_us, module)."""
+    imports = []
+    for line in stderr_text.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|")
+            imports.append((int(cumulative_us), int(self_us), module.rstrip()))
+        except ValueError:
+            continue
+    return imports
+
+def run_once(main_path):
+    """Run the application once and return the startup marks in milliseconds and the import times."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-X", "importtime", str(main_path), "--startup-bench"],
+                               cwd=main_path.parent, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    marks = {}
+    for line in process.stdout:
+        mark = line.strip()
+        if mark in ("first_frame", "map_ready"):
+            marks[mark] = (time.perf_counter() - start) * 1000.0
+    stderr_text = process.stderr.read()
+    process.wait()
+    return marks, parse_importtime(stderr_text)
+
+def main():
+    """Main function to run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description="Measure application startup time")
+    parser.add_argument("--runs", type=int, default=5, help="number of launches to take the median over")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to list")
+    parser.add_argument("--record", metavar="PATH", help="append the result as a JSON line to this file")
+    args = parser.parse_args()
+
+    main_path = Path(__file__).resolve().parent / "main.py"
+    results = {"first_frame": [], "map_ready": []}
+    imports = []
+
+    print("Startup Benchmark")
+    print("=" * 50)
+    for run in range(args.runs):
+        marks, imports = run_once(main_path)
+        if "first_frame" not in marks:
+            print("Error: the application exited before drawing its first frame!")
+            sys.exit(1)
+        for mark, value in marks.items():
+            results[mark].append(value)
+        print(f"Run {run + 1}: " + ", ".join(f"{mark} {value:.0f} ms" for mark, value in marks.items()))
+
+    summary = {mark: round(statistics.median(values), 1) for mark, values in results.items() if values}
+    top_level = [item for item in imports if not item[2].startswith("  ")]
+    total_import_ms = sum(item[0] for item in top_level) / 1000.0
+
+    print(f"\nMedian time to first frame: {summary['first_frame']} ms")
+    if "map_ready" in summary:
+        print(f"Median time to map ready: {summary['map_ready']} ms")
+    print(f"Total import time (last run): {total_import_ms:.1f} ms")
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, self_us, module in sorted(imports, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000.0:>8.1f} ms  {module.strip()}")
+
+    if args.record:
+        record = {"timestamp": datetime.now().isoformat(timespec="seconds"), "runs": args.runs,
+                  "import_ms": round(total_import_ms, 1), **{f"{mark}_ms": value for mark, value in summary.items()}}
+        with open(args.record, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+        print(f"\nRecorded result in {args.record}")
+
+if __name__ == "__main__":
+    main()
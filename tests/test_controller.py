@@ -0,0 +1,104 @@
+import json
+import math
+from controller import Controller
+from Services.regions import Region, RegionRegistry
+
+"Tests of the Controller against a fake Foursquare client that answers from a fixed set of venues"
+
+KM_PER_DEGREE = 111.0
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, venues):
+        self.body = json.dumps({"results": [{"fsq_place_id": venue_id, "latitude": lat, "longitude": lon}
+                                            for venue_id, lat, lon in venues]}).encode()
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, venues):
+        self.venues = venues
+        self.calls = []
+
+    def getNearbyLocations(self, params=None, stream=False, priority=0):
+        self.calls.append(params)
+        if "ne" in params:
+            north, east = map(float, params["ne"].split(","))
+            south, west = map(float, params["sw"].split(","))
+            hits = [venue for venue in self.venues if south <= venue[1] <= north and west <= venue[2] <= east]
+            return FakeResponse(hits[:params["limit"]])
+
+        lat, lon = map(float, params["ll"].split(","))
+        radius_km = params["radius"] / 1000.0
+        cos_lat = math.cos(math.radians(lat))
+
+        def distance(venue):
+            return math.hypot((venue[1] - lat) * KM_PER_DEGREE, (venue[2] - lon) * KM_PER_DEGREE * cos_lat)
+
+        hits = [venue for venue in self.venues if distance(venue) <= radius_km]
+        if params.get("sort") == "DISTANCE":
+            hits.sort(key=distance)
+        return FakeResponse(hits[:params["limit"]])
+
+
+class FakeCluster:
+    def __init__(self, center):
+        self.center = center
+
+
+def make_venues(count, center=(52.01, 4.36), spread=0.02):
+    return [(f"venue-{i}", center[0] + spread * math.sin(i), center[1] + spread * math.cos(i * 1.3)) for i in range(count)]
+
+def test_get_locations_without_regions():
+    client = FakeClient(make_venues(30))
+    controller = Controller(client=client)
+
+    venues = controller.getLocations((52.01, 4.36))
+
+    assert len(venues) == 30
+    assert len(client.calls) >= 1
+    assert all(51.98 <= lat <= 52.04 and 4.33 <= lon <= 4.39 for lat, lon in venues)
+
+def test_get_locations_in_a_region_reuses_the_search():
+    client = FakeClient(make_venues(30))
+    registry = RegionRegistry([Region("delft", (51.9, 4.2, 52.1, 4.5))])
+    controller = Controller(client=client, regions=registry)
+
+    venues = controller.getLocations((52.01, 4.36))
+    calls = len(client.calls)
+    again = controller.getLocations((52.01, 4.36))
+
+    assert len(venues) == 30
+    assert again is venues
+    assert len(client.calls) == calls
+    assert registry.loaded() == ["delft"]
+    registry.close()
+
+def test_get_idling_places_covers_clusters_without_parking():
+    client = FakeClient([("parking-1", 52.010, 4.360), ("parking-2", 52.050, 4.400)])
+    clusters = [FakeCluster((52.011, 4.361)), FakeCluster((52.049, 4.401)), FakeCluster((52.100, 4.300))]
+    controller = Controller(client=client)
+
+    places = controller.get_idling_places(clusters)
+
+    assert len(client.calls) == 1
+    assert places[(52.011, 4.361)] == (52.010, 4.360)
+    assert places[(52.049, 4.401)] == (52.050, 4.400)
+    assert places[(52.100, 4.300)] is None
+
+def test_get_idling_places_stops_after_max_searches():
+    client = FakeClient(make_venues(400, spread=0.05))
+    clusters = [FakeCluster((52.01 + 0.01 * i, 4.36 + 0.01 * (i % 3))) for i in range(10)]
+    controller = Controller(client=client)
+
+    places = controller.get_idling_places(clusters, max_searches=3)
+
+    assert len(client.calls) == 3
+    assert len(places) < len(clusters)
@@ -0,0 +1,44 @@
+import math
+from Services.demand_grid import build_demand_grid, count_venues
+from tests.test_controller import FakeClient, make_venues
+
+"Tests of the demand grid venue counts against a fake Foursquare client"
+
+RADIUS_M = 1000.0 / math.sqrt(2.0)
+
+def test_count_venues_below_a_full_page():
+    client = FakeClient(make_venues(20, spread=0.003))
+
+    count, saturated = count_venues(client, (52.01, 4.36), RADIUS_M, "13000")
+
+    assert (count, saturated) == (20, False)
+    assert len(client.calls) == 1
+
+def test_count_venues_splits_full_pages():
+    client = FakeClient(make_venues(120, spread=0.004))
+
+    count, saturated = count_venues(client, (52.01, 4.36), RADIUS_M, "13000")
+
+    assert (count, saturated) == (120, False)
+    assert len(client.calls) > 1
+
+def test_count_venues_marks_cells_still_full_at_the_deepest_split():
+    client = FakeClient(make_venues(2000, spread=0.004))
+
+    count, saturated = count_venues(client, (52.01, 4.36), RADIUS_M, "13000", max_depth=1)
+
+    assert saturated
+    assert 50 < count < 2000
+    assert len(client.calls) == 5
+
+def test_build_demand_grid_keeps_saturated_cells(tmp_path):
+    def venue_counter(coords, radius_m, category_id):
+        return (50, True) if coords[0] < 52.0 else (3, False)
+
+    grid = build_demand_grid((51.99, 4.35, 52.01, 4.37), 1.0, venue_counter, [["13000"]] * 168, ["13000"])
+    grid.save(str(tmp_path / "grid"))
+    loaded = type(grid).load(str(tmp_path / "grid"))
+
+    assert grid.saturated and grid.saturated != {(row, col) for row in range(grid.rows) for col in range(grid.cols)}
+    assert loaded.saturated == grid.saturated
+    loaded.close()
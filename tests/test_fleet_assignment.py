@@ -0,0 +1,39 @@
+import itertools
+import random
+from Services.fleet_assignment import candidate_costs, min_cost_assignment
+
+"Tests of the capacity-aware driver assignment against brute force on small inputs"
+
+def brute_force_cost(costs, capacities):
+    columns = [column for column, capacity in enumerate(capacities) for _ in range(capacity)]
+    return min(sum(costs[driver][column] for driver, column in enumerate(choice))
+               for choice in itertools.permutations(columns, len(costs)))
+
+def test_min_cost_assignment_matches_brute_force():
+    random.seed(7)
+    for _ in range(200):
+        centers = [(52 + random.random() * 0.1, 4.3 + random.random() * 0.1) for _ in range(random.randint(1, 4))]
+        drivers = [(52 + random.random() * 0.1, 4.3 + random.random() * 0.1) for _ in range(random.randint(1, 5))]
+        capacities = [random.randint(1, 3) for _ in centers]
+        if sum(capacities) < len(drivers):
+            capacities[0] += len(drivers) - sum(capacities)
+        costs, all_costs = candidate_costs(drivers, centers, candidates=len(centers))
+        dense = [all_costs(driver) for driver in range(len(drivers))]
+
+        assignment = min_cost_assignment(costs, capacities, all_costs)
+
+        assert all(assignment.count(column) <= capacity for column, capacity in enumerate(capacities))
+        cost = sum(dense[driver][column] for driver, column in enumerate(assignment))
+        assert abs(cost - brute_force_cost(dense, capacities)) < 1e-9
+
+def test_pruned_candidates_still_place_every_driver():
+    random.seed(3)
+    centers = [(52 + random.random() * 0.2, 4.3 + random.random() * 0.3) for _ in range(40)]
+    drivers = [(52 + random.random() * 0.2, 4.3 + random.random() * 0.3) for _ in range(300)]
+    capacities = [1] * 39 + [261]
+    costs, all_costs = candidate_costs(drivers, centers, candidates=3)
+
+    assignment = min_cost_assignment(costs, capacities, all_costs)
+
+    assert None not in assignment
+    assert all(assignment.count(column) <= capacity for column, capacity in enumerate(capacities))
@@ -1,29 +1,55 @@
 import customtkinter
-from tkintermapview import TkinterMapView
-import requests
 import json
 import math
+import os
+import socket
 import threading
 from controller import Controller
 from process_logic import ProcessLogic
+from Services.tracing import tracer
+from Services.metrics import metrics
+from Services.geometry import RouteCache, RoutePyramid, decode_polyline
+from Services.scheduler import PREFETCH, DroppedRequest, scheduler
 
 customtkinter.set_default_color_theme("blue")
 
-def calculate_cluster_radius(cluster_locations, center_coords, total_locations):
+TILE_SERVER_URL = "https://mt0.google.com/vt/lyrs=m&hl=en&x={x}&y={y}&z={z}&s=Ga"
+TILE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data", "tile_cache.mbtiles")
+TILE_CACHE_MAX_BYTES = 200 * 1024 * 1024
+PREFETCH_CLUSTER_COUNT = 5
+# Zoom level the map jumps to when it shows a recommended area, routes fetched in the background are simplified for it
+ROUTE_ZOOM = 15
+WARM_UP_HOSTS = ("mt0.google.com", "router.project-osrm.org", "nominatim.openstreetmap.org", "places-api.foursquare.com")
+
+def warm_up():
+    """
+    Imports the libraries used on the first request and resolves the API hosts,
+    so the first click does not pay for module loading and DNS lookups
+    """
+    import geopy.distance
+    import requests
+
+    for host in WARM_UP_HOSTS:
+        try:
+            socket.getaddrinfo(host, 443)
+        except OSError:
+            pass
+
+def calculate_cluster_radius(cluster_size, center_coords, total_locations):
     """
     Calculate an appropriate radius for a cluster based on its spread.
     
     Args:
-        cluster_locations (list): List of (lat, lon) tuples in the cluster
+        cluster_size (int): Number of locations in the cluster
         center_coords (tuple): Center coordinates as (latitude, longitude)
     
     Returns:
         float: Radius in kilometers
     """
-    if len(cluster_locations) <= 1:
+    if cluster_size <= 1:
         return 0.5
     
-    radius = 0.3 + (1.7 - 0.3) * math.log(len(cluster_locations)) / math.log(total_locations)
+    radius = 0.3 + (1.7 - 0.3) * math.log(cluster_size) / math.log(total_locations)
     return radius
 
 def create_circular_polygon(center_coords, radius_km=0.5, num_points=20):
@@ -61,7 +87,19 @@ def create_circular_polygon(center_coords, radius_km=0.5, num_points=20):
     
     return points
 
-def get_driving_route(start_coords, end_coords):
+route_cache = RouteCache()
+
+def timed_get(provider, url, **kwargs):
+    """
+    GET request that records its latency for the provider, submitted to the request scheduler by the callers
+    """
+    import requests
+
+    with metrics.time("external_request_seconds", "Latency of outbound API calls", provider=provider):
+        return requests.get(url, **kwargs)
+
+@tracer.traced("get_driving_route")
+def get_driving_route(start_coords, end_coords, zoom=None):
     """
     Get driving route waypoints between two coordinates using OpenRouteService.
     
@@ -71,6 +109,8 @@ def get_driving_route(start_coords, end_coords):
     Args:
         start_coords (tuple): Starting coordinates as (latitude, longitude)
         end_coords (tuple): Destination coordinates as (latitude, longitude)
+        zoom (float): Map zoom level the route is drawn at, the waypoints are simplified
+                      to about half a pixel at that zoom (default: full geometry)
     
     Returns:
         list: A list containing only the start and end coordinates as a fallback
@@ -89,30 +129,45 @@ def get_driving_route(start_coords, end_coords):
         >>> print(route)
         [(52.0116, 4.3571), (52.3676, 4.9041)]
     """
+    cached = route_cache.get(start_coords, end_coords)
+    if cached is not None:
+        metrics.counter("route_cache_requests_total", "Route cache lookups by result", result="hit").inc()
+        pyramid, distance, duration = cached
+        return pyramid.for_zoom(zoom), distance, duration
+    metrics.counter("route_cache_requests_total", "Route cache lookups by result", result="miss").inc()
+
     try:
         url = f"http://router.project-osrm.org/route/v1/driving/{start_coords[1]},{start_coords[0]};{end_coords[1]},{end_coords[0]}"
         params = {
             'overview': 'full',
-            'geometries': 'geojson'
+            'geometries': 'polyline6'
         }
-        response = requests.get(url, params=params, timeout=10)
+        response = scheduler.call("osrm", timed_get, "osrm", url, params=params, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
             if data.get('code') == 'Ok' and data.get('routes'):
-                coordinates = data['routes'][0]['geometry']['coordinates']
+                metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="osrm", outcome="ok").inc()
+                waypoints = decode_polyline(data['routes'][0]['geometry'], precision=6)
                 distance = round(float(data['routes'][0]['legs'][0]['distance']) / 1000.0, 1)
                 duration = math.ceil(float(data['routes'][0]['legs'][0]['duration']) / 60.0)
-                waypoints = [(coord[1], coord[0]) for coord in coordinates]
-                return waypoints, distance, duration
+                pyramid = RoutePyramid(waypoints)
+                route_cache.put(start_coords, end_coords, (pyramid, distance, duration))
+                return pyramid.for_zoom(zoom), distance, duration
             else:
+                metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="osrm", outcome="no_route").inc()
                 print(f"OSRM routing failed: {data}")
                 return [start_coords, end_coords], None, None
         else:
+            metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="osrm", outcome="http_error").inc()
             print(f"OSRM request failed with status code: {response.status_code}")
             return [start_coords, end_coords], None, None
-            
+
+    except DroppedRequest as e:
+        print(f"OSRM route request dropped: {e}")
+        return [start_coords, end_coords], None, None
     except Exception as e:
+        metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="osrm", outcome="error").inc()
         print(f"Error getting OSRM route: {e}")
         return [start_coords, end_coords], None, None
 
@@ -126,6 +181,10 @@ class App(customtkinter.CTk):
     current_location_coords = None
     process_logic = ProcessLogic()
     is_processing = False
+    idle_places = {}
+    idle_clusters = None
+    route_path = None
+    tile_region_state = None
 
     def __init__(self, controller, *args, **kwargs):
         """
@@ -187,8 +246,7 @@ class App(customtkinter.CTk):
         self.frame_right.grid_columnconfigure(1, weight=0)
         self.frame_right.grid_columnconfigure(2, weight=1)
 
-        self.map_widget = TkinterMapView(self.frame_right, corner_radius=0)
-        self.map_widget.grid(row=1, rowspan=1, column=0, columnspan=3, sticky="nswe", padx=(0, 0), pady=(0, 0))
+        self.map_widget = None
 
         self.entry = customtkinter.CTkEntry(master=self.frame_right,
                                             placeholder_text="Type address...", font=("Inter", 12),)
@@ -201,6 +259,27 @@ class App(customtkinter.CTk):
                                                 command=self.search_event)
         self.button_5.grid(row=0, column=1, sticky="w", padx=(12, 0), pady=12)
 
+        self.appearance_mode_optionemenu.set("Dark")
+
+        # The map widget pulls in tkintermapview, PIL and requests, so it is only built once the window is on screen
+        self.is_processing = True
+        for button in (self.button_1, self.button_2, self.button_5):
+            button.configure(state="disabled")
+        self.after_idle(self._build_map)
+
+    def _build_map(self):
+        """
+        Creates the map widget after the first frame is drawn and warms the network clients in the background
+        """
+        from map_view import CachedMapView
+        from Services.tile_cache import TileCache, TilePrefetcher
+
+        self.tile_cache = TileCache(TILE_CACHE_PATH, TILE_SERVER_URL, max_bytes=TILE_CACHE_MAX_BYTES)
+        self.tile_prefetcher = TilePrefetcher(self.tile_cache)
+
+        self.map_widget = CachedMapView(self.frame_right, corner_radius=0, tile_cache=self.tile_cache)
+        self.map_widget.grid(row=1, rowspan=1, column=0, columnspan=3, sticky="nswe", padx=(0, 0), pady=(0, 0))
+
         delft_coords = (52.01173610138923, 4.359210368076695)
         if delft_coords:
             lat, lon = delft_coords
@@ -211,16 +290,42 @@ class App(customtkinter.CTk):
             self.current_location_coords = (52.0116, 4.3571)
             self.current_location_marker = self.map_widget.set_position(52.0116, 4.3571, marker=True)
             self.map_widget.set_zoom(16)
-        
-        self.appearance_mode_optionemenu.set("Dark")
-        self.map_widget.set_tile_server("https://mt0.google.com/vt/lyrs=m&hl=en&x={x}&y={y}&z={z}&s=Ga", max_zoom=22)
+
+        self.map_widget.set_tile_server(TILE_SERVER_URL, max_zoom=22)
         self.map_widget.add_right_click_menu_command(label="Route to here",
                                             command=self.add_route_event,
                                             pass_coords=True)
         self.map_widget.add_right_click_menu_command(label="Set location here",
                                             command=self.search_event_with_address,
                                             pass_coords=True)
-                                            
+        self.map_widget.add_right_click_menu_command(label="Route to best area nearby",
+                                            command=self.route_to_best_area)
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.map_widget.canvas.bind(sequence, self._refresh_route_detail, add="+")
+
+        self.is_processing = False
+        for button in (self.button_1, self.button_2, self.button_5):
+            button.configure(state="normal")
+
+        threading.Thread(target=warm_up, daemon=True).start()
+        self._use_region_tile_cache(self.current_location_coords)
+        self.tile_prefetcher.prefetch_around(self.current_location_coords)
+        self.event_generate("<<MapReady>>")
+
+    def _use_region_tile_cache(self, coords):
+        """
+        Switches the map to the tile cache of the configured region containing the coordinate, or back to the default one
+        """
+        # The map keeps the region state whose tile cache it reads, so evicting the region does not close the cache under it
+        state = self.controller.acquire_region_state(coords)
+        self.controller.release_region_state(self.tile_region_state)
+        self.tile_region_state = state
+        cache = state.tile_cache(TILE_SERVER_URL, TILE_CACHE_MAX_BYTES) if state is not None else None
+        cache = cache or self.tile_cache
+        if cache is not self.map_widget.tile_cache:
+            self.map_widget.tile_cache = cache
+            self.tile_prefetcher.cache = cache
 
     def _set_buttons_loading_state(self, is_loading=True):
         """
@@ -263,11 +368,32 @@ class App(customtkinter.CTk):
             return
 
         busy_address = self.process_logic.cluster_average(polygon.position_list)
-        idle_address = self.controller.get_idling_place(busy_address)
+        found, idle_address = self._find_precomputed_idle_place(busy_address)
+        if not found:
+            metrics.counter("idle_place_fallback_total", "Idle area clicks that needed their own parking search").inc()
+            idle_address = self.controller.get_idling_place(busy_address)
 
         self.map_widget.delete_all_polygon()
         self._update_map_for_idle_place(idle_address)
 
+    def _find_precomputed_idle_place(self, busy_address):
+        """
+        Looks up the parking place found for the clicked cluster by the bulk search, the polygon average is the cluster center.
+        Returns whether the bulk search covered the cluster and the place, which is None when there is no parking within 1 km
+        """
+        for center, idle_address in self.idle_places.items():
+            if abs(center[0] - busy_address[0]) < 1e-6 and abs(center[1] - busy_address[1]) < 1e-6:
+                return True, idle_address
+        return False, None
+
+    def _prefetch_cluster_tiles(self, clusters):
+        """
+        Prefetches the map tiles around the largest clusters at the zoom levels used when routing to them
+        """
+        largest = sorted(clusters, key=len, reverse=True)[:PREFETCH_CLUSTER_COUNT]
+        for cluster in largest:
+            self.tile_prefetcher.prefetch_around(cluster.center, zooms=(15,), radius=1)
+
     def update_status(self, message):
         """Update the status label with a new message"""
         self.status_label.configure(text=f"Status:\n{message}")
@@ -342,6 +468,7 @@ TROUBLESHOOTING:
         close_button = customtkinter.CTkButton(help_window, text="Close", command=help_window.destroy)
         close_button.pack(pady=10)
 
+    @tracer.traced("find_busy_place", profile=True)
     def _find_busy_place_threaded(self):
         """
         Finds the busiest place near the current location in a separate thread,
@@ -353,7 +480,7 @@ TROUBLESHOOTING:
             locations = self.controller.getLocations(self.current_location_coords)
             self.after(0, self.update_status, "Analyzing locations...")
             
-            clusters = self.process_logic.cluster_maker(locations)
+            clusters = self.process_logic.cluster_maker(locations, self.controller.cluster_difference_for(self.current_location_coords))
 
             total_locations = len(locations)
             self.map_widget.delete_all_marker()
@@ -361,19 +488,22 @@ TROUBLESHOOTING:
             self.map_widget.delete_all_polygon()
             self.current_route_label.configure(text="")
             self.map_widget.set_marker(self.current_location_coords[0], self.current_location_coords[1])
-            for cluster in clusters:
-                cluster_locations = cluster[0]
-                cluster_center = cluster[1]
+            with tracer.span("render_clusters", clusters=len(clusters)):
+                for cluster in clusters:
+                    cluster_size = len(cluster)
+                    cluster_center = cluster.center
                 
-                radius = calculate_cluster_radius(cluster_locations, cluster_center, total_locations)
-                name = f"Busyness: {len(cluster_locations)}\nDistance: {round(self.process_logic.distance_finder(self.current_location_coords, cluster_center), 1)} km"
+                    radius = calculate_cluster_radius(cluster_size, cluster_center, total_locations)
+                    name = f"Busyness: {cluster_size}\nDistance: {round(self.process_logic.distance_finder(self.current_location_coords, cluster_center), 1)} km"
 
-                circle_points = create_circular_polygon(cluster_center, radius_km=radius)
-                self.map_widget.set_polygon(circle_points, command=self.click_busy_area, fill_color="aquamarine2", outline_color="firebrick2")
-                self.map_widget.set_marker(cluster_center[0], cluster_center[1], text=name, font=("Inter", 18), marker_color_circle="dodgerblue4", marker_color_outside="steelblue")
+                    circle_points = create_circular_polygon(cluster_center, radius_km=radius)
+                    self.map_widget.set_polygon(circle_points, command=self.click_busy_area, fill_color="aquamarine2", outline_color="firebrick2")
+                    self.map_widget.set_marker(cluster_center[0], cluster_center[1], text=name, font=("Inter", 18), marker_color_circle="dodgerblue4", marker_color_outside="steelblue")
 
             self.after(0, self.update_status, "Calculating busy areas...")
 
+            self._prefetch_cluster_tiles(clusters)
+
             if clusters:
                 self.after(0, self.update_status, "Route calculated")
                 self.current_route_label.configure(text="Click an area to route to there")
@@ -387,6 +517,7 @@ TROUBLESHOOTING:
         finally:
             self.after(0, self._set_buttons_loading_state, False)
 
+    @tracer.traced("find_idle_place", profile=True)
     def _find_idle_place_threaded(self):
         """
         Finds the best place to sit idle while waiting for requests in a separate thread,
@@ -398,8 +529,10 @@ TROUBLESHOOTING:
             locations = self.controller.getLocations(self.current_location_coords)
             self.after(0, self.update_status, "Analyzing locations...")
             
-            clusters = self.process_logic.cluster_maker(locations)
+            clusters = self.process_logic.cluster_maker(locations, self.controller.cluster_difference_for(self.current_location_coords))
             self.after(0, self.update_status, "Calculating idle areas...")
+            self.idle_clusters = clusters
+            self.idle_places = {}
 
             total_locations = len(locations)
             self.map_widget.delete_all_marker()
@@ -407,19 +540,23 @@ TROUBLESHOOTING:
             self.map_widget.delete_all_polygon()
             self.current_route_label.configure(text="")
             self.map_widget.set_marker(self.current_location_coords[0], self.current_location_coords[1])
-            for cluster in clusters:
-                cluster_locations = cluster[0]
-                cluster_center = cluster[1]
+            with tracer.span("render_clusters", clusters=len(clusters)):
+                for cluster in clusters:
+                    cluster_size = len(cluster)
+                    cluster_center = cluster.center
                 
-                radius = calculate_cluster_radius(cluster_locations, cluster_center, total_locations)
+                    radius = calculate_cluster_radius(cluster_size, cluster_center, total_locations)
                 
-                name = f"Busyness: {len(cluster_locations)}\nDistance: {round(self.process_logic.distance_finder(self.current_location_coords, cluster_center), 1)} km"
+                    name = f"Busyness: {cluster_size}\nDistance: {round(self.process_logic.distance_finder(self.current_location_coords, cluster_center), 1)} km"
 
-                circle_points = create_circular_polygon(cluster_center, radius_km=radius)
-                self.map_widget.set_polygon(circle_points, command=self.click_idle_area, fill_color="aquamarine2", outline_color="firebrick2")
-                self.map_widget.set_marker(cluster_center[0], cluster_center[1], text=name, font=("Inter", 18), marker_color_circle="dodgerblue4", marker_color_outside="steelblue")
+                    circle_points = create_circular_polygon(cluster_center, radius_km=radius)
+                    self.map_widget.set_polygon(circle_points, command=self.click_idle_area, fill_color="aquamarine2", outline_color="firebrick2")
+                    self.map_widget.set_marker(cluster_center[0], cluster_center[1], text=name, font=("Inter", 18), marker_color_circle="dodgerblue4", marker_color_outside="steelblue")
             
+            self._prefetch_cluster_tiles(clusters)
+
             if clusters:
+                threading.Thread(target=self._find_idle_places_threaded, args=(clusters,), daemon=True).start()
                 self.after(0, self.update_status, "Route calculated")
                 self.current_route_label.configure(text="Click an area to route to there")
             else:
@@ -432,9 +569,25 @@ TROUBLESHOOTING:
         finally:
             self.after(0, self._set_buttons_loading_state, False)
 
-    def _update_map_for_busy_place(self, busy_address):
+    def _find_idle_places_threaded(self, clusters):
         """
-        Update the map with the new busy adress and the route between current location and the new busy address
+        Looks up the parking places of the drawn clusters in the background, so a click on a cluster needs no search
+        """
+        try:
+            idle_places = self.controller.get_idling_places(clusters, priority=PREFETCH)
+        except Exception as e:
+            print(f"Error finding parking for all areas: {e}")
+            return
+        self.after(0, self._set_idle_places, clusters, idle_places)
+
+    def _set_idle_places(self, clusters, idle_places):
+        if clusters is self.idle_clusters:
+            self.idle_places = idle_places
+
+    def _update_map_for_busy_place(self, busy_address, route=None):
+        """
+        Update the map with the new busy adress and the route between current location and the new busy address,
+        route is the result of get_driving_route when it was already fetched off the Tk thread
         """
         self.map_widget.delete_all_marker()
         if self.current_location_coords:
@@ -449,13 +602,10 @@ TROUBLESHOOTING:
 
         lat, lon = busy_address
         busy_area_marker = self.map_widget.set_position(lat, lon, marker=True, marker_color_circle="dodgerblue4", marker_color_outside="steelblue")
-        self.map_widget.set_zoom(15)
+        self.map_widget.set_zoom(ROUTE_ZOOM)
         
         if self.current_location_coords:
-            route_waypoints, distance, duration = get_driving_route(self.current_location_coords, (lat, lon))
-            self.current_route_label.configure(text=f"Current Route:\n\nDistance: {distance} km\nDuration: {duration} minutes")
-            busy_path = self.map_widget.set_path(route_waypoints)
-            print(f"Generated driving route with {len(route_waypoints)} waypoints")
+            self._show_route(self.current_location_coords, (lat, lon), route)
 
 
     def _update_map_for_idle_place(self, idle_address):
@@ -478,13 +628,43 @@ TROUBLESHOOTING:
         self.map_widget.set_zoom(15)
         
         if self.current_location_coords:
-            route_waypoints, distance, duration = get_driving_route(self.current_location_coords, (lat, lon))
-            self.current_route_label.configure(text=f"Current Route:\n\nDistance: {distance} km\nDuration: {duration} minutes")
-            idle_path = self.map_widget.set_path(route_waypoints)
-            print(f"Generated driving route with {len(route_waypoints)} waypoints")
+            self._show_route(self.current_location_coords, (lat, lon))
         
         print(f"Found address '{idle_address}' at coordinates: {lat}, {lon}")
 
+    def _show_route(self, start_coords, end_coords, route=None):
+        """
+        Draws the driving route simplified for the current zoom level and shows its distance and duration
+        """
+        route_waypoints, distance, duration = route or get_driving_route(start_coords, end_coords, zoom=self.map_widget.zoom)
+        self.current_route_label.configure(text=f"Current Route:\n\nDistance: {distance} km\nDuration: {duration} minutes")
+        self.route_path = self.map_widget.set_path(route_waypoints)
+        self.route_endpoints = (start_coords, end_coords)
+        self.route_zoom = self.map_widget.zoom
+        print(f"Generated driving route with {len(route_waypoints)} waypoints")
+
+    def _refresh_route_detail(self, event=None):
+        self.after_idle(self._redraw_route_for_zoom)
+
+    def _redraw_route_for_zoom(self):
+        """
+        Redraws the current route from the cached route pyramid when the zoom level needs a different level of detail
+        """
+        path = self.route_path
+        if path is None or getattr(path, "deleted", False):
+            return
+        cached = route_cache.get(*self.route_endpoints)
+        if cached is None:
+            return
+
+        pyramid = cached[0]
+        zoom = self.map_widget.zoom
+        if pyramid.level_for(zoom) == pyramid.level_for(self.route_zoom):
+            return
+        path.delete()
+        self.route_path = self.map_widget.set_path(pyramid.for_zoom(zoom))
+        self.route_zoom = zoom
+
     def search_event(self, event=None):
         """
         Searches for own location from inputted address
@@ -512,18 +692,25 @@ TROUBLESHOOTING:
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = scheduler.call("nominatim", timed_get, "nominatim", url, headers=headers, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if data:
+                    metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="nominatim", outcome="ok").inc()
                     return float(data[0]['lat']), float(data[0]['lon'])
                 else:
+                    metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="nominatim", outcome="no_result").inc()
                     print(f"No results found for address: {address}")
                     return None
             else:
+                metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="nominatim", outcome="http_error").inc()
                 print(f"Geocoding failed with status code: {response.status_code}")
                 return None
+        except DroppedRequest as e:
+            print(f"Geocoding request dropped: {e}")
+            return None
         except Exception as e:
+            metrics.counter("external_requests_total", "Outbound API calls by outcome", provider="nominatim", outcome="error").inc()
             print(f"Error geocoding address '{address}': {e}")
             return None
 
@@ -543,6 +730,8 @@ TROUBLESHOOTING:
                 self.current_location_coords = (lat, lon)
                 self.current_location_marker = self.map_widget.set_position(lat, lon, marker=True)
                 self.map_widget.set_zoom(15)
+                self._use_region_tile_cache(self.current_location_coords)
+                self.tile_prefetcher.prefetch_around(self.current_location_coords)
                 self.update_status("Location found")
                 print(f"Found address '{address}' at coordinates: {lat}, {lon}")
             else:
@@ -593,17 +782,91 @@ TROUBLESHOOTING:
         new_area_marker = self.map_widget.set_marker(lat, lon, marker_color_circle="dodgerblue4", marker_color_outside="steelblue")
 
         if self.current_location_coords:
-            route_waypoints, distance, duration = get_driving_route(self.current_location_coords, (lat, lon))
-            self.current_route_label.configure(text=f"Current Route:\n\nDistance: {distance} km\nDuration: {duration} minutes")
-            busy_path = self.map_widget.set_path(route_waypoints)
-            print(f"Generated driving route with {len(route_waypoints)} waypoints")
+            self._show_route(self.current_location_coords, (lat, lon))
         
         print(f"Setting route to coordinates: {lat}, {lon}")
 
+    def route_to_best_area(self):
+        """
+        Routes to the best nearby busy area, read from the precomputed demand grid when it covers the current location
+        """
+        if self.is_processing or not self.current_location_coords:
+            return
+
+        self.update_status("Finding best area...")
+        self._set_buttons_loading_state(True)
+
+        thread = threading.Thread(target=self._route_to_best_area_threaded, args=(self.current_location_coords,), daemon=True)
+        thread.start()
+
+    def _route_to_best_area_threaded(self, current_coords):
+        """
+        Finds the best nearby area and its route in a separate thread and draws them on the Tk thread
+        """
+        try:
+            busy_address = self.controller.get_best_nearby_area(current_coords)
+            route = get_driving_route(current_coords, busy_address, zoom=ROUTE_ZOOM) if busy_address else None
+            self.after(0, self._update_map_for_busy_place, busy_address, route)
+            if busy_address:
+                self.after(0, self.update_status, "Route calculated")
+        except Exception as e:
+            self.after(0, self.update_status, f"Error: {str(e)}")
+            print(f"Error finding best nearby area: {e}")
+        finally:
+            self.after(0, self._set_buttons_loading_state, False)
+
+    def follow_gps(self, positions):
+        """
+        Follows a stream of GPS positions in a separate thread and keeps the route to the recommended busy area up to date
+        """
+        from Services.gps_stream import RecommendationStream
+
+        def run():
+            stream = RecommendationStream(self.controller, self.process_logic)
+            region = None
+            try:
+                for position, recommendation, changed in stream.run(positions):
+                    position_region = self.controller.region_for(position)
+                    if position_region is not region:
+                        # Loads the state of the new region here, so switching its tile cache does not block the Tk thread
+                        region = position_region
+                        with self.controller.region_state(position):
+                            self.after(0, self._use_region_tile_cache, position)
+                    route = None
+                    if changed and recommendation:
+                        route = get_driving_route(position, recommendation, zoom=ROUTE_ZOOM)
+                    self.after(0, self._show_gps_position, position, recommendation, changed, route)
+            except Exception as e:
+                self.after(0, self.update_status, f"GPS error: {str(e)}")
+                print(f"Error following GPS stream: {e}")
+
+        self.gps_marker = None
+        self.update_status("Following GPS...")
+        threading.Thread(target=run, daemon=True).start()
+
+    def _show_gps_position(self, position, recommendation, changed, route=None):
+        """
+        Moves the current location to the new GPS position and draws the route fetched by the GPS thread when the recommendation changed
+        """
+        self.current_location_coords = position
+        if changed:
+            self.gps_marker = None
+            self._update_map_for_busy_place(recommendation, route)
+            if recommendation:
+                self.update_status("Route updated")
+            return
+
+        if self.gps_marker is None:
+            self.gps_marker = self.map_widget.set_marker(position[0], position[1], marker_color_circle="white", marker_color_outside="black")
+        else:
+            self.gps_marker.set_position(position[0], position[1])
+
     def change_appearance_mode(self, new_appearance_mode: str):
         customtkinter.set_appearance_mode(new_appearance_mode)
 
     def on_closing(self, event=0):
+        if self.map_widget is not None:
+            self.tile_prefetcher.shutdown()
         self.destroy()
 
     def start(self):